@@ -0,0 +1,66 @@
+"""
+Save-path conversion throughput per output format.
+
+    python -m benchmarks.bench_conversion [seconds] [block_size]
+
+MB/s is measured on the float32 input (4 bytes per sample). "legacy int16"
+is the previous whole-take path: np.concatenate + np.clip + astype.
+"xN" = blocks converted per PcmConverter call (the recorder uses SAVE_CHUNK_BLOCKS).
+"""
+import sys
+import time
+
+import numpy as np
+
+from src.recorder.wavio import PcmConverter
+
+SAMPLE_RATE = 48000
+SAVE_CHUNK_BLOCKS = 64
+REPEATS = 5
+
+
+def legacy_int16(blocks):
+    audio = np.concatenate(blocks)
+    signal = np.clip(audio, -1.0, 1.0)
+    return (signal * 32767).astype(np.int16)
+
+
+def converter_pass(bits, dither, block_size, chunk_blocks):
+    def run(blocks):
+        converter = PcmConverter(bits, block_size * chunk_blocks, dither=dither)
+        for i in range(0, len(blocks), chunk_blocks):
+            converter.convert(blocks[i:i + chunk_blocks])
+    return run
+
+
+def bench(name, func, blocks, input_bytes):
+    best = min(_timed(func, blocks) for _ in range(REPEATS))
+    print(f"{name:<24} {input_bytes / best / 1e6:>9.1f} MB/s  {best * 1e3:>8.1f} ms")
+
+
+def _timed(func, blocks):
+    start = time.perf_counter()
+    func(blocks)
+    return time.perf_counter() - start
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    block_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    rng = np.random.default_rng(0)
+    n_blocks = int(seconds * SAMPLE_RATE / block_size)
+    blocks = list((rng.standard_normal((n_blocks, block_size)) * 0.3).astype(np.float32))
+    input_bytes = n_blocks * block_size * 4
+
+    print(f"take={seconds:.0f}s blocks={n_blocks}x{block_size} input={input_bytes / 1e6:.1f} MB")
+    bench("legacy int16", legacy_int16, blocks, input_bytes)
+    for chunk_blocks in (1, SAVE_CHUNK_BLOCKS):
+        for bits in (16, 24, 32):
+            bench(f"{bits}-bit x{chunk_blocks}", converter_pass(bits, False, block_size, chunk_blocks), blocks, input_bytes)
+        for bits in (16, 24):
+            bench(f"{bits}-bit TPDF x{chunk_blocks}", converter_pass(bits, True, block_size, chunk_blocks), blocks, input_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Idle cost of the real consumer loop (prebuffer only, or disarmed metering):
+per-block vs batched.
+
+    python -m benchmarks.bench_idle [batch_blocks] [seconds] [block_size]
+
+A producer thread paces sub-threshold blocks into Monitor's queue in real
+time, like the PortAudio callback does, while Monitor._run consumes them
+with a RecorderEngine behind it. Reported per second of audio:
+
+- consumer CPU (thread_time of the consumer thread) and process CPU
+- wakeups: voluntary context switches of the consumer thread (Linux,
+  /proc/self/task/<tid>/status), i.e. how often it actually slept and woke
+"""
+import io
+import logging
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext, redirect_stdout
+
+import numpy as np
+
+import src.monitor as monitor
+from src.monitor import Monitor
+from src.recorder.engine import RecorderEngine, RecorderSettings
+
+SAMPLE_RATE = 48000
+
+
+class EngineMonitor(Monitor):
+    def __init__(self, logger, engine):
+        super().__init__(logger)
+        self.engine = engine
+
+    last_level = property(lambda self: self.engine.last_level)
+
+    def handle_block(self, block):
+        self.engine.handle_block(block)
+
+    def can_batch(self) -> bool:
+        return self.engine.can_batch()
+
+    def handle_batch(self, blocks: list):
+        self.engine.handle_batch(blocks)
+
+
+def voluntary_switches() -> int | None:
+    try:
+        with open(f"/proc/self/task/{threading.get_native_id()}/status") as f:
+            for line in f:
+                if line.startswith("voluntary_ctxt_switches"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run(batch_blocks, seconds, block_size, band, armed=True):
+    monitor.IDLE_BATCH_BLOCKS = batch_blocks
+    monitor.HARDWARE_ENABLED = False
+
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    settings = RecorderSettings(
+        output_dir=tempfile.mkdtemp(),
+        sample_rate=SAMPLE_RATE,
+        block_size=block_size,
+        threshold=0.02,
+        min_session_seconds=0,
+        trigger_band={"low_hz": 150, "high_hz": 8000, "order": 4} if band else None,
+    )
+    consumer = EngineMonitor(logger, RecorderEngine(settings, logger=logger))
+    consumer.engine.arm(armed)
+
+    def next_block():
+        block = consumer.audio_queue.get()
+        if block is None:
+            raise KeyboardInterrupt  # ends _run cleanly
+        return block
+
+    def poll_block():
+        block = consumer._queue_get_nowait()
+        if block is None and stopped.is_set() and consumer.audio_queue.empty():
+            raise KeyboardInterrupt
+        return block
+
+    stopped = threading.Event()
+    result = {}
+
+    def consume():
+        switches, cpu = voluntary_switches(), time.thread_time()
+        with redirect_stdout(io.StringIO()):  # _run prints a newline on interrupt
+            consumer._run(nullcontext, next_block, poll_block)
+        result["cpu"] = time.thread_time() - cpu
+        if switches is not None:
+            result["wakeups"] = voluntary_switches() - switches
+
+    rng = np.random.default_rng(0)
+    n_blocks = int(seconds * SAMPLE_RATE / block_size)
+    blocks = list((rng.standard_normal((n_blocks, block_size)) * 0.001).astype(np.float32))
+    period = block_size / SAMPLE_RATE
+
+    thread = threading.Thread(target=consume, name="consumer")
+    process_cpu = time.process_time()
+    thread.start()
+
+    deadline = time.perf_counter()
+    for block in blocks:
+        deadline += period
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        consumer.audio_queue.put(block)
+    stopped.set()
+    consumer.audio_queue.put(None)
+    thread.join()
+
+    result["process_cpu"] = time.process_time() - process_cpu
+    return result
+
+
+def main():
+    batch_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+    block_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+
+    print(f"{seconds:g}s of paced audio per run, blocks of {block_size}, batch={batch_blocks}")
+    print(f"{'':<22} {'consumer ms/s':>14} {'process ms/s':>13} {'wakeups/s':>10}")
+
+    for name, band, armed in (("rms", False, True), ("band", True, True), ("disarmed", False, False)):
+        for batch in (1, batch_blocks):
+            r = run(batch, seconds, block_size, band, armed)
+            wakeups = f"{r['wakeups'] / seconds:>10.1f}" if "wakeups" in r else f"{'n/a':>10}"
+            label = f"{name} {'per block' if batch == 1 else f'batched x{batch}'}"
+            print(f"{label:<22} {r['cpu'] / seconds * 1e3:>14.2f} {r['process_cpu'] / seconds * 1e3:>13.2f} {wakeups}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Per-block cost of the trigger level detectors.
+
+    python -m benchmarks.bench_trigger [block_size] [sample_rate]
+
+Budget per block is block_size / sample_rate (21.3 ms for 1024 @ 48 kHz).
+"""
+import itertools
+import sys
+import timeit
+
+import numpy as np
+
+from src.recorder.trigger import BandLevel, rms_level
+
+REPEATS = 2000
+
+
+def bench(name, detector, blocks, budget_us):
+    cycle = itertools.cycle(blocks)
+    per_block = min(timeit.repeat(lambda: detector(next(cycle)), number=REPEATS, repeat=5)) / REPEATS * 1e6
+    print(f"{name:<28} {per_block:>9.1f} us/block  {per_block / budget_us * 100:>6.2f}% of budget")
+
+
+def main():
+    block_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    sample_rate = int(sys.argv[2]) if len(sys.argv) > 2 else 48000
+    budget_us = block_size / sample_rate * 1e6
+
+    rng = np.random.default_rng(0)
+    blocks = (rng.standard_normal((64, block_size)) * 0.05).astype(np.float32)
+
+    print(f"block={block_size} rate={sample_rate} budget={budget_us:.0f} us")
+    bench("rms_level (broadband)", rms_level, blocks, budget_us)
+    for order in (2, 4):
+        bench(f"BandLevel 150-8000 Hz o{order}", BandLevel(sample_rate, 150, 8000, order), blocks, budget_us)
+    bench("BandLevel highpass 150 Hz o4", BandLevel(sample_rate, 150, None, 4), blocks, budget_us)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import json
+import os
 from copy import deepcopy
 import logging
 
@@ -14,6 +15,7 @@ def _get_default_config():
         "interface_name": None, # Device name (USB Interface) or index for audio input
         "device_id": get_device_id(),
         "debug_mode": False,
+        "hardware": True, # encoder, toggle switch and LED (only one process may own them)
         "autoupdate": {
             "enabled": True,
             "check_interval_hours": 24,
@@ -25,6 +27,11 @@ def _get_default_config():
             "channel_index": 1,
             "sample_rate": 48000,
             "block_size": 1024,
+            "shared_memory_ring": False, # capture callback -> shared memory -> separate processing process
+            "ring_blocks": 256,
+            # idle (prebuffer only): handle this many blocks per wakeup; 1 = per block
+            "idle_batch_blocks": 4,
+            "idle_approach_ratio": 0.5, # back to per-block once a level reaches this fraction of the threshold
         },
         "ntfy": {
                 "enabled": True,
@@ -40,6 +47,39 @@ def _get_default_config():
             "threshold": 0.015,
             "trigger_duration": 0.5,
             "encoder_step": 0.005,
+            # trigger on energy inside a frequency band instead of broadband RMS
+            # (ignores rumble / mains hum; threshold then applies to the band level)
+            "trigger_band": {
+                "enabled": False,
+                "low_hz": 150,
+                "high_hz": 8000,
+                "order": 4,
+            },
+            "bit_depth": 16, # 16, 24 (packed PCM) or 32 (float)
+            # per-take peak / clipping / loudness, stored next to each file (rec_*.json)
+            "true_peak": True, # 4x oversampled peak (costs more CPU per block on a Pi Zero)
+            "dither": False, # TPDF dither when reducing to integer PCM
+            "normalize": {
+                "enabled": False,
+                "target_lufs": -16.0,
+                "true_peak_ceiling_db": -1.0,
+            },
+            # after each save: trim leading/trailing silence and split at long gaps
+            "postprocess": {
+                "enabled": False,
+                "split": True,
+                "min_gap_seconds": 20, # silence at least this long starts a new take
+                "pad_seconds": 1.0, # context kept around each take
+                "min_take_seconds": 2,
+                "window_ms": 50,
+                "keep_original": False,
+            },
+            # spectral-peak fingerprint per take; takes overlapping an earlier one are flagged
+            "fingerprint": {
+                "enabled": False,
+                "min_overlap": 0.5, # share of the shorter take's hashes that line up
+                "recent_takes": 20, # only the latest takes are compared; older fingerprints are deleted
+            },
             "files": {
                 "delete_old_files": False,
                 "days_to_keep": 90,
@@ -47,6 +87,35 @@ def _get_default_config():
                 "upload_after_record": True,
                 "delete_after_upload": False,
             }
+        },
+        # calendar arming: outside "armed" windows auto record can't trigger,
+        # inside "forced" windows recording runs regardless of level
+        "schedule": {
+            "enabled": False,
+            "disarmed_mode": "idle", # "idle" = input stream stopped, "metering" = level every Nth block only
+            "metering_decimation": 8,
+            "armed": [
+                {"days": ["mon", "tue", "wed", "thu", "fri", "sat", "sun"], "start": "08:00", "end": "23:00"},
+            ],
+            "forced": [], # {"start": "2026-10-20T19:00", "end": "2026-10-20T22:00", "label": "ensaio"}
+        },
+        # supervisor mode: one capture process per entry (empty = single device from general.interface_name)
+        # {"name": "sala_a", "interface_name": "Scarlett", "output_subdir": "sala_a", "cpu": 1,
+        #  "hardware": False, "recorder": {"threshold": 0.02}, "monitor": {"channel_index": 2},
+        #  "control": {"port": 8766}} (default: control.port + index, unix_socket + "_<name>")
+        "devices": [],
+        # JSON-lines control API (see src/control.py); commands run between audio blocks
+        "control": {
+            "enabled": False,
+            "host": "127.0.0.1", # 0.0.0.0 to accept a controller on the network
+            "port": 8765, # None = no TCP listener
+            "unix_socket": None, # e.g. "/run/rolfsound.sock"
+            "token": None, # required in every request when set
+        },
+        "profiler": {
+            "enabled": False,
+            "sample_hz": 50, # stack samples per second (all threads)
+            "max_stack_depth": 64,
         }
     }
 
@@ -57,6 +126,10 @@ from src.utils import get_root_path
 _config: dict | None = None
 _config_path = get_root_path() / "config.json"
 
+# JSON merged over config.json without being saved (set by the supervisor for each capture process)
+OVERRIDE_ENV = "ROLFSOUND_CONFIG_OVERRIDE"
+_override: dict | None = None
+
 # ---------- helpers ----------
 
 def _deep_merge(defaults: dict, override: dict) -> dict:
@@ -75,7 +148,7 @@ def _deep_merge(defaults: dict, override: dict) -> dict:
 # ---------- API ----------
 
 def load() -> None:
-    global _config
+    global _config, _override
     
     # Get fresh defaults based on current env vars
     default_config = _get_default_config()
@@ -87,6 +160,11 @@ def load() -> None:
     else:
         _config = deepcopy(default_config)
         save()
+
+    override = os.environ.get(OVERRIDE_ENV)
+    if override:
+        _override = json.loads(override)
+        _config = _deep_merge(_config, _override)
         
 def reload() -> None:
     load()
@@ -94,6 +172,9 @@ def reload() -> None:
 def save() -> None:
     if _config is None:
         return
+    if _override:
+        logger.warning("Config com override de processo; não será salva em config.json")
+        return
     with _config_path.open("w", encoding="utf-8") as f:
         json.dump(_config, f, indent=4)
 
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import threading
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuração
+# =========================
+
+CONTROL = config.get("control")
+MAX_LINE_BYTES = 64 * 1024
+REPLY_TIMEOUT_SECONDS = 5.0  # the audio loop drains commands between blocks
+
+# commands reachable over the network; the rest (encoder steps, save_defaults
+# writing config.json, ...) stay internal to the hardware callbacks
+REMOTE_COMMANDS = frozenset({
+    "start_manual",
+    "stop_manual",
+    "set_threshold",
+    "set_auto_record",
+    "mark",
+    "status",
+})
+
+# =========================
+# Server
+# =========================
+
+class ControlServer:
+    """
+    Local control API: one JSON object per line over TCP (and/or a Unix socket),
+    one JSON reply per line.
+
+        {"cmd": "set_threshold", "value": 0.02, "id": 7, "token": "..."}
+        {"id": 7, "ok": true, "result": 0.02, "queue_ms": 4.1, "exec_ms": 0.05}
+
+    The asyncio loop runs on its own thread and never touches recorder state:
+    every command goes through `submit(name, args, reply)` (Monitor.submit),
+    which the audio loop executes between blocks.
+    """
+
+    def __init__(self, submit, settings: dict = CONTROL):
+        self.submit = submit
+        self.settings = settings
+        self._loop = None
+        self._stop = None
+        self._thread = threading.Thread(
+            target=self._main,
+            name="control",
+            daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        # nothing to stop if the server never came up (e.g. address in use) or already exited
+        if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        except RuntimeError:  # loop closed since the check
+            return
+        self._thread.join(REPLY_TIMEOUT_SECONDS)
+
+    def _main(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            logger.error(f"Erro no servidor de controle: {e}", exc_info=True)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+
+        servers = []
+        if self.settings.get("port"):
+            host = self.settings.get("host", "127.0.0.1")
+            servers.append(await asyncio.start_server(self._client, host, self.settings["port"], limit=MAX_LINE_BYTES))
+            logger.info(f"Controle remoto em {host}:{self.settings['port']}")
+        if self.settings.get("unix_socket"):
+            servers.append(await asyncio.start_unix_server(self._client, self.settings["unix_socket"], limit=MAX_LINE_BYTES))
+            logger.info(f"Controle remoto em {self.settings['unix_socket']}")
+
+        await self._stop.wait()
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                reply = await self._handle(line)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.debug(f"Cliente de controle desconectado: {e}")
+        finally:
+            writer.close()
+
+    async def _handle(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or not isinstance(request.get("cmd"), str):
+            return {"ok": False, "error": "requisição inválida"}
+        name = request.pop("cmd")
+
+        reply = {"id": request.pop("id", None)}
+        token = self.settings.get("token")
+        if token and request.pop("token", None) != token:
+            return {**reply, "ok": False, "error": "token inválido"}
+        request.pop("token", None)
+
+        if name not in REMOTE_COMMANDS:
+            return {**reply, "ok": False, "error": f"comando desconhecido: {name}"}
+
+        future = self._loop.create_future()
+
+        def done(result, error, queue_ms, exec_ms):
+            self._loop.call_soon_threadsafe(_resolve, future, (result, error, queue_ms, exec_ms))
+
+        self.submit(name, request, done)
+
+        try:
+            result, error, queue_ms, exec_ms = await asyncio.wait_for(future, REPLY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return {**reply, "ok": False, "error": "sem resposta do loop de áudio"}
+
+        reply.update(queue_ms=round(queue_ms, 2), exec_ms=round(exec_ms, 2))
+        if error is not None:
+            return {**reply, "ok": False, "error": error}
+        return {**reply, "ok": True, "result": result}
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def create_control_server(submit):
+    """None unless control.enabled in config."""
+    if not CONTROL["enabled"]:
+        return None
+    return ControlServer(submit)
+
+# =========================
+# Client
+# =========================
+
+async def send_command(cmd: str, host="127.0.0.1", port=None, unix_socket=None, token=None, **args) -> dict:
+    """One request/reply against a ControlServer (for controllers driving several boxes)."""
+    if unix_socket:
+        reader, writer = await asyncio.open_unix_connection(unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection(host, port or CONTROL["port"])
+
+    try:
+        request = {"cmd": cmd, **args}
+        if token:
+            request["token"] = token
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
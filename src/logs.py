@@ -0,0 +1,169 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = 'latest.log'
+LOG_QUEUE_SIZE = 10000
+
+# attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+# =========================
+# Formatter / Handler
+# =========================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are kept as structured keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+
+        # records from the queue carry the traceback already formatted (see prepare)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue that never blocks the caller.
+    Records that don't fit are counted and reported once the queue drains.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        """
+        Like QueueHandler.prepare (message merged, no unpicklable exc_info),
+        but the traceback stays in exc_text instead of being folded into msg,
+        so JsonFormatter can write it as its own field.
+        """
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+
+        if self._unreported:
+            lost, self._unreported = self._unreported, 0
+            notice = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                f"{lost} registros de log descartados (fila cheia)", None, None,
+            )
+            notice.dropped_total = self.dropped
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self._unreported += lost
+
+# =========================
+# Setup
+# =========================
+
+def setup_logging():
+    """
+    Root logger -> bounded queue -> listener thread -> file (JSON lines) + console.
+    File rotation and SD writes happen on the listener thread, never on the caller.
+    """
+    global _listener
+
+    logger = logging.getLogger()
+    if not logger.handlers:
+        logger.setLevel(logging.DEBUG)
+
+        file_handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=5 * 1024 * 1024,
+            backupCount=2,
+            encoding='utf-8'
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(JsonFormatter())
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.DEBUG)
+        console_handler.setFormatter(logging.Formatter('%(levelname)-8s | %(message)s'))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        logger.addHandler(DroppingQueueHandler(log_queue))
+
+    return logger
+
+
+def setup_child_logging(log_queue):
+    """
+    For capture processes started by the supervisor: everything goes to the
+    supervisor's log pipeline through a multiprocessing queue.
+    """
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    return logger
+
+
+def start_process_log_listener(log_queue):
+    """Forward records from child processes into this process' root handlers."""
+    listener = QueueListener(log_queue, *logging.getLogger().handlers)
+    listener.start()
+    return listener
+
+
+def shutdown_logging():
+    """Flush pending records; call once on exit."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return handler.dropped
+    return 0
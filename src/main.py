@@ -1,54 +1,30 @@
 import sys
 import time
-import logging
-from logging.handlers import RotatingFileHandler
+import signal
 
 import RPi.GPIO as GPIO
 import sounddevice as sd
 
 from src.hardware import gpio_manager
 import src.hardware.led_recording as led_recording
-from src import config
+from src import config, logs
 
 config.load()
 
 from src.recorder.rec import Recorder
+from src.recorder.files_manager import RetentionWorker
+from src.supervisor import run_supervisor
+from src.shm_ring import run_ring_mode
 from src.utils import get_version
 
 DEVICE_NAME = config.get("general")["interface_name"] or None
+DEVICES = config.get("devices")
+SHARED_MEMORY_RING = config.get("monitor")["shared_memory_ring"]
 
 # =========================
 # Utilidades
 # =========================
 
-def setup_logging():
-    logger = logging.getLogger()
-    if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
-
-        formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-
-        file_handler = RotatingFileHandler(
-            'latest.log',
-            maxBytes=5 * 1024 * 1024,
-            backupCount=2,
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        console_handler.setFormatter(logging.Formatter('%(levelname)-8s | %(message)s'))
-
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-
-    return logger
-    
 def find_input_device(name_hint):
     if name_hint is None:
         # use default input device
@@ -67,7 +43,7 @@ def find_input_device(name_hint):
     raise RuntimeError("Dispositivo não encontrado")
 
 def main():
-    logger = setup_logging()
+    logger = logs.setup_logging()
 
     # initialize GPIO once for entire app
     try:
@@ -83,7 +59,6 @@ def main():
 
     # TODOs:
     # update from git
-    # delete old recordings (>90 days) if enabled
     # check size of "recordings" folder and warn if too large
     # finish setup google drive uploader/authentication
     # add logic to detect pendrive and transfer files from "recordings" to pendrive. Then delete local files after transfer.
@@ -101,14 +76,42 @@ def main():
         # long-press encoder to save current "threshold" as default in config file
         # normal push button for "screen modes".
 
+    if DEVICES:
+        # one capture process per device; see src/supervisor.py
+        try:
+            run_supervisor(DEVICES, find_input_device)
+        except Exception as e:
+            logger.error(f"Erro fatal no supervisor: {e}", exc_info=True)
+            sys.exit(1)
+        finally:
+            gpio_manager.cleanup_gpio()
+        return
+
     try:
         device_index = find_input_device(DEVICE_NAME)
     except Exception as e:
         logger.error(f"Erro ao encontrar dispositivo de entrada: {e}")
         sys.exit(1)
 
+    retention = RetentionWorker()
+    retention.start()
+
+    if SHARED_MEMORY_RING:
+        try:
+            run_ring_mode(device_index, logger)
+        except Exception as e:
+            logger.error(f"Erro fatal: {e}", exc_info=True)
+            sys.exit(1)
+        finally:
+            gpio_manager.cleanup_gpio()
+        return
+
     recorder = Recorder(logger)
 
+    # `kill -USR1 <pid>` writes a flamegraph-compatible profile to recordings/profiles
+    if recorder.profiler:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: recorder.profiler.request_dump())
+
     try:
         recorder.run(device_index)
     except Exception as e:
@@ -1,10 +1,14 @@
 import queue
-from time import time
+from contextlib import nullcontext
+from time import time, monotonic
 
 import numpy as np
 import sounddevice as sd
 
 from src import config
+from src.control import create_control_server
+from src.profiler import create_profiler, null_span
+from src.recorder.trigger import rms_level
 
 try:
     from src.hardware.enconder_KY_040 import EncoderControl
@@ -23,6 +27,7 @@ def get_session_uptime() -> float:  # seconds
 # =========================
 SESSION_STARTED_AT = None
 DEBUG_MODE = config.get("general")["debug_mode"]
+HARDWARE_ENABLED = config.get("general")["hardware"]
 
 TRIGGER_DURATION = config.get("recorder")["trigger_duration"]
 SAMPLE_RATE = config.get("monitor")["sample_rate"]
@@ -35,10 +40,33 @@ MONITOR_ALL_CHANNELS = config.get("monitor")["monitor_all_channels"]
 # Utilidades
 # =========================
 
-def rms_level(block: np.ndarray) -> float:
-    return np.sqrt(np.mean(block * block))
+def configured_channel_index():
+    """None = mix all channels, otherwise 0-based channel from config."""
+    if MONITOR_ALL_CHANNELS:
+        return None
+    return MONITOR_CHANNEL - 1
+
+def downmix(indata: np.ndarray, channel_index, out: np.ndarray = None) -> np.ndarray:
+    """Input frames (frames, channels) -> mono block, optionally into a preallocated `out`."""
+    if channel_index is None:
+        return np.mean(indata, axis=1, out=out)
+
+    if indata.shape[1] <= channel_index:
+        channel_index = 0
+
+    if out is None:
+        return indata[:, channel_index].copy()
+
+    np.copyto(out, indata[:, channel_index])
+    return out
 
 RELATIVE_CHANGE = 0.05  # 5% to display log changes in debug mode false
+STATUS_LOG_INTERVAL = 1.0  # seconds between status log lines in debug mode false
+PAUSED_POLL_SECONDS = 1.0  # loop wakeup while the input stream is stopped
+
+# idle batching: while only the prebuffer is being fed, wake up once per N blocks
+IDLE_BATCH_BLOCKS = config.get("monitor")["idle_batch_blocks"]
+BLOCK_SECONDS = BLOCK_SIZE / SAMPLE_RATE
 
 def changed(prev, curr, rel=RELATIVE_CHANGE, abs_min=1e-3) -> bool:
     if prev is None:
@@ -52,6 +80,16 @@ def changed(prev, curr, rel=RELATIVE_CHANGE, abs_min=1e-3) -> bool:
     scale = max(abs(prev), abs_min)
     return abs(curr - prev) >= scale * rel
 
+def open_input_stream(device_index, callback) -> sd.InputStream:
+    return sd.InputStream(
+        device=device_index,
+        channels=2,
+        samplerate=SAMPLE_RATE,
+        blocksize=BLOCK_SIZE,
+        dtype="float32",
+        callback=callback,
+    )
+
 # =========================
 # Classe base
 # =========================
@@ -63,14 +101,28 @@ class Monitor:
         self.monitor_all_channels = MONITOR_ALL_CHANNELS
 
         self._last_logged = {}
+        self._last_status_at = 0.0
 
-        if self.monitor_all_channels:
-            self.channel_index = None
-        else:
-            self.channel_index = MONITOR_CHANNEL - 1
+        # input stream can be stopped while nothing needs audio (see pause_input)
+        self._stream = None
+        self.input_paused = False
 
-        if ENCODER_AVAILABLE:
+        # None unless profiler.enabled in config
+        self.profiler = create_profiler(logger)
+
+        # controls (remote API and hardware callbacks) are queued here and run
+        # by the audio loop between blocks, so only one thread touches state
+        self.commands = queue.SimpleQueue()
+        self.command_count = 0
+        self.command_max_queue_ms = 0.0
+        self.control = create_control_server(self.submit)
+
+        self.channel_index = configured_channel_index()
+
+        if ENCODER_AVAILABLE and HARDWARE_ENABLED:
             self.encoder = EncoderControl(logger=logger)
+        elif not HARDWARE_ENABLED:
+            self.encoder = None
         else:
             logger.warning("Encoder não disponível")
             self.encoder = None
@@ -79,74 +131,200 @@ class Monitor:
         if status:
             self.logger.warning(f"Audio status: {status}")
 
-        if self.monitor_all_channels or self.channel_index is None:
-            block = indata.mean(axis=1)
-        elif indata.shape[1] > self.channel_index:
-            block = indata[:, self.channel_index].copy()
-        else:
-            block = indata[:, 0].copy()
-
-        self.audio_queue.put(block)
+        self.audio_queue.put(downmix(indata, self.channel_index))
 
     def handle_block(self, block: np.ndarray):
         """Override in subclasses."""
         pass
 
+    def can_batch(self) -> bool:
+        """True while blocks may be handled several at a time (see handle_batch). Override in subclasses."""
+        return False
+
+    def handle_batch(self, blocks: list):
+        for block in blocks:
+            self.handle_block(block)
+
+    def handle_paused(self):
+        """Called about once per PAUSED_POLL_SECONDS while the input is paused. Override in subclasses."""
+        pass
+
+    def shutdown(self):
+        """Called once when the audio loop ends, after the control server stops. Override in subclasses."""
+        pass
+
+    # =========================
+    # Commands
+    # =========================
+
+    def submit(self, name: str, args: dict | None = None, reply=None):
+        """
+        Queue a command for the audio loop; thread-safe. `reply(result, error,
+        queue_ms, exec_ms)` is called from the audio loop once it has run.
+        """
+        self.commands.put((name, args or {}, reply, monotonic()))
+
+    def handle_command(self, name: str, args: dict):
+        """Run one command and return its result. Override in subclasses."""
+        raise ValueError(f"Comando desconhecido: {name}")
+
+    def _run_command(self, command):
+        name, args, reply, queued_at = command
+        started = monotonic()
+        error = None
+        try:
+            result = self.handle_command(name, args)
+        except Exception as e:
+            result, error = None, str(e) or type(e).__name__
+            self.logger.warning(f"Comando {name} falhou: {error}")
+
+        queue_ms = (started - queued_at) * 1000
+        exec_ms = (monotonic() - started) * 1000
+        self.command_count += 1
+        self.command_max_queue_ms = max(self.command_max_queue_ms, queue_ms)
+        self.logger.debug(f"Comando {name}: fila {queue_ms:.1f} ms, execução {exec_ms:.2f} ms")
+
+        if reply:
+            reply(result, error, queue_ms, exec_ms)
+
+    def _run_commands(self):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            self._run_command(command)
+
+    def pause_input(self) -> bool:
+        """Stop the input stream (no callbacks, no CPU). False when the stream isn't ours to stop."""
+        if self._stream is None or self.input_paused:
+            return False
+
+        self._stream.stop()
+        while not self.audio_queue.empty():
+            self.audio_queue.get_nowait()
+        self.input_paused = True
+        self.logger.info("Entrada de áudio pausada")
+        return True
+
+    def resume_input(self):
+        if self._stream is None or not self.input_paused:
+            return
+
+        self._stream.start()
+        self.input_paused = False
+        self.logger.info("Entrada de áudio retomada")
+
+    def report_status(self, block: np.ndarray):
+        # debug: live console update
+        # prod: at most one line per STATUS_LOG_INTERVAL, only when values change meaningfully
+
+        if not DEBUG_MODE:
+            now = monotonic()
+            if now - self._last_status_at < STATUS_LOG_INTERVAL:
+                return
+            self._last_status_at = now
+
+        rms = getattr(self, "last_level", None)
+        fields = {
+            "recording": getattr(self, "recording", False),
+            "rms": rms_level(block) if rms is None else float(rms),
+            "threshold": getattr(self, "threshold", 0.0),
+            "trigger": getattr(self, "trigger_samples", 0) / SAMPLE_RATE,
+            "silence": getattr(self, "silence_samples", 0) / SAMPLE_RATE,
+        }
+
+        msg =  f"[Recording] {fields['recording']} | "\
+            f"[RMS] {fields['rms']:.4f} | "\
+            f"[Threshold] {fields['threshold']:.4f} | "\
+            f"[Trigger] {fields['trigger']:.2f}s/{TRIGGER_DURATION:.1f}s | "\
+            f"[Silence] {fields['silence']:.1f}s"
+
+        if DEBUG_MODE:
+            print("\r" + msg.ljust(100), end="", flush=True)
+            return
+
+        if any(changed(self._last_logged.get(k), v) for k, v in fields.items()):
+            self._last_logged = fields
+            self.logger.debug(msg, extra={"status": fields})
+
+    def _queue_get_nowait(self):
+        try:
+            return self.audio_queue.get_nowait()
+        except queue.Empty:
+            return None
+
     def run(self, device_index):
+        self._run(
+            lambda: open_input_stream(device_index, self.audio_callback),
+            self.audio_queue.get,
+            self._queue_get_nowait,
+        )
+
+    def run_ring(self, ring):
+        """Consume blocks written by a capture process into a shared-memory ring (src/shm_ring.py)."""
+        self._run(nullcontext, ring.get, ring.get_nowait)
+
+    def _run(self, open_source, next_block, poll_block):
+        span = self.profiler.span if self.profiler else null_span
+        if self.profiler:
+            self.profiler.start()
+        if self.control:
+            self.control.start()
+
         try:
-            with sd.InputStream(
-                device=device_index,
-                channels=2,
-                samplerate=SAMPLE_RATE,
-                blocksize=BLOCK_SIZE,
-                dtype="float32",
-                callback=self.audio_callback,
-            ):
+            with open_source() as stream:
+                self._stream = stream
                 self.logger.info("Monitorando áudio... Pressione Ctrl+C para sair.")
 
                 global SESSION_STARTED_AT
                 SESSION_STARTED_AT = time()
 
                 while True:
-                    block = self.audio_queue.get()
-                    self.handle_block(block)
-
-                    threshold = getattr(self, "threshold", 0.0)
-
-                    recording = getattr(self, 'recording', False)
-                    rms = getattr(self, '_last_rms', rms_level(block))
-                    trigger_s = getattr(self, "trigger_samples", 0) / SAMPLE_RATE
-                    silence_s = getattr(self, "silence_samples", 0) / SAMPLE_RATE
-
-                    msg =  f"[Recording] {recording} | "\
-                        f"[RMS] {rms:.4f} | "\
-                        f"[Threshold] {threshold:.4f} | "\
-                        f"[Trigger] {trigger_s:.2f}s/{TRIGGER_DURATION:.1f}s | "\
-                        f"[Silence] {silence_s:.1f}s"\
-
-                    # debug: live console update
-                    # prod: log only when values change meaningfully
-
-                    if DEBUG_MODE:
-                        print("\r" + msg.ljust(100), end="", flush=True)
-                    else:
-                        fields = {
-                            "recording": recording,
-                            "rms": rms,
-                            "threshold": threshold,
-                            "trigger": trigger_s,
-                            "silence": silence_s,
-                        }
-
-                        should_log = False
-                        for k, v in fields.items():
-                            if changed(self._last_logged.get(k), v):
-                                should_log = True
-                                break
-                            
-                        if should_log:
-                            self._last_logged = fields.copy()
-                            self.logger.debug(msg)
+                    with span("commands"):
+                        self._run_commands()
+
+                    if self.input_paused:
+                        # no blocks to pace the loop: wake up for commands right away
+                        try:
+                            self._run_command(self.commands.get(timeout=PAUSED_POLL_SECONDS))
+                        except queue.Empty:
+                            pass
+                        self.handle_paused()
+                        continue
+
+                    if IDLE_BATCH_BLOCKS > 1 and self.can_batch():
+                        # one wakeup per batch instead of per block
+                        # (a queued command cuts the wait short)
+                        with span("idle_sleep"):
+                            try:
+                                command = self.commands.get(timeout=IDLE_BATCH_BLOCKS * BLOCK_SECONDS)
+                            except queue.Empty:
+                                command = None
+                        if command is not None:
+                            self._run_command(command)
+
+                        blocks = []
+                        while (block := poll_block()) is not None:
+                            blocks.append(block)
+                        if not blocks:
+                            continue
+
+                        with span("handle_batch"):
+                            self.handle_batch(blocks)
+
+                        with span("status"):
+                            self.report_status(blocks[-1])
+                        continue
+
+                    with span("queue_wait"):
+                        block = next_block()
+
+                    with span("handle_block"):
+                        self.handle_block(block)
+
+                    with span("status"):
+                        self.report_status(block)
 
         except KeyboardInterrupt:
             print()
@@ -154,3 +332,11 @@ class Monitor:
 
         except Exception as e:
             self.logger.error(f"Erro: {e}", exc_info=True)
+
+        finally:
+            if self.control:
+                self.control.stop()
+            self.shutdown()
+            if self.profiler:
+                self.profiler.stop()
+                self.profiler.dump()
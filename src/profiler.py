@@ -0,0 +1,200 @@
+import gc
+import os
+import sys
+import threading
+from collections import Counter, deque
+from contextlib import nullcontext
+from datetime import datetime
+from time import perf_counter
+
+from src import config
+
+# =========================
+# Configuração
+# =========================
+
+PROFILER_ENABLED = config.get("profiler")["enabled"]
+SAMPLE_HZ = config.get("profiler")["sample_hz"]
+MAX_STACK_DEPTH = config.get("profiler")["max_stack_depth"]
+OUTPUT_DIR = os.path.join(config.get("recorder")["output_dir"], "profiles")
+
+_NULL_SPAN = nullcontext()
+
+
+def null_span(name: str):
+    """Span used when profiling is disabled (no timing, no allocation)."""
+    return _NULL_SPAN
+
+# =========================
+# Profiler
+# =========================
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_span(self.name, perf_counter() - self.start)
+        return False
+
+
+class SamplingProfiler:
+    """
+    Low-rate stack sampler for every thread, plus per-stage timing spans.
+
+    Samples are aggregated as collapsed stacks ("thread;func;func count"),
+    the format read by flamegraph.pl / speedscope / inferno.
+    """
+
+    def __init__(self, logger, sample_hz=SAMPLE_HZ, output_dir=OUTPUT_DIR):
+        self.logger = logger
+        self.interval = 1.0 / sample_hz
+        self.output_dir = output_dir
+
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._spans = {}  # name -> [count, total_s, max_s]
+        # gc pauses are queued without the lock: a collection can start on a
+        # thread that already holds it (any allocation inside add_span/dump)
+        self._gc_pauses = deque()
+        self._gc_start = None
+
+        self._stop_event = threading.Event()
+        self._dump_event = threading.Event()
+        self._thread = None
+
+    # =========================================================
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        gc.callbacks.append(self._on_gc)
+        self._thread = threading.Thread(
+            target=self._sample_loop,
+            name="profiler",
+            daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f"Profiler ativo ({1.0 / self.interval:.0f} Hz) -> {self.output_dir}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def request_dump(self):
+        """Safe to call from signal handlers and hardware callbacks."""
+        self._dump_event.set()
+
+    # =========================================================
+
+    def span(self, name: str):
+        return _Span(self, name)
+
+    def add_span(self, name: str, seconds: float):
+        new_entry = [1, seconds, seconds]  # allocated outside the lock
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                self._spans[name] = new_entry
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = perf_counter()
+        elif self._gc_start is not None:
+            self._gc_pauses.append((info["generation"], perf_counter() - self._gc_start))
+            self._gc_start = None
+
+    # =========================================================
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+
+        while not self._stop_event.wait(self.interval):
+            self._sample(own_ident)
+
+            if self._dump_event.is_set():
+                self._dump_event.clear()
+                self.dump()
+
+    def _sample(self, own_ident):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        collapsed = []
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+
+            funcs = []
+            while frame is not None and len(funcs) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                funcs.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+
+            funcs.append(names.get(ident, str(ident)))
+            collapsed.append(";".join(reversed(funcs)))
+
+        with self._lock:
+            self._stacks.update(collapsed)
+
+    # =========================================================
+
+    def dump(self):
+        """Write and reset collected samples. Returns the .folded path."""
+        new_stacks, new_spans = Counter(), {}
+        with self._lock:
+            stacks, self._stacks = self._stacks, new_stacks
+            spans, self._spans = self._spans, new_spans
+
+        while self._gc_pauses:
+            generation, seconds = self._gc_pauses.popleft()
+            entry = spans.setdefault(f"gc_gen{generation}", [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            stacks_path = os.path.join(self.output_dir, f"profile_{ts}.folded")
+            spans_path = os.path.join(self.output_dir, f"spans_{ts}.txt")
+
+            with open(stacks_path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+            with open(spans_path, "w", encoding="utf-8") as f:
+                f.write(f"{'span':<20} {'count':>8} {'total_ms':>10} {'mean_us':>10} {'max_us':>10}\n")
+                for name, (count, total, worst) in sorted(spans.items()):
+                    f.write(
+                        f"{name:<20} {count:>8} {total * 1e3:>10.1f} "
+                        f"{total / count * 1e6:>10.1f} {worst * 1e6:>10.1f}\n"
+                    )
+
+            self.logger.info(f"Profile salvo: {stacks_path} ({sum(stacks.values())} amostras)")
+            return stacks_path
+
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar profile: {e}")
+            return None
+
+
+def create_profiler(logger):
+    """Returns a SamplingProfiler when enabled in config, otherwise None."""
+    if not PROFILER_ENABLED:
+        return None
+    return SamplingProfiler(logger)
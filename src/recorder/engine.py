@@ -0,0 +1,653 @@
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic
+
+import numpy as np
+
+from src.recorder.fingerprint import DuplicateDetector, RECENT_TAKES
+from src.recorder.loudness import TakeStats
+from src.recorder.postprocess import PostProcessor
+from src.recorder.trigger import BandLevel, rms_level, rms_levels
+from src.recorder.wavio import BIT_DEPTHS, PcmConverter, WavWriter
+
+# Embedding API. Bump the minor version for additions, the major one for
+# anything that breaks existing callers of RecorderSettings / RecorderEngine.
+API_VERSION = "1.1"
+
+# event kinds passed to sinks
+RECORDING_STARTED = "recording_started"
+RECORDING_STOPPED = "recording_stopped"
+TAKE_SAVED = "take_saved"
+
+SAVE_CHUNK_BLOCKS = 64  # blocks converted per call when saving (~1.4 s at 48 kHz / 1024)
+FINGERPRINT_DIR = "fingerprints"  # inside output_dir
+
+# =========================
+# Settings
+# =========================
+
+@dataclass
+class RecorderSettings:
+    """
+    Everything the engine needs, passed in explicitly (see rec.settings_from_config
+    for the values from config.json). Engines sharing a process should use
+    different output_dir values.
+    """
+
+    output_dir: str
+    sample_rate: int = 48000
+    block_size: int = 1024
+    name: str | None = None
+
+    auto_record: bool = True
+    threshold: float = 0.02
+    min_threshold: float = 0.0
+    max_threshold: float = 1.0
+    trigger_duration: float = 0.5  # seconds above threshold to start
+    stop_seconds: float = 10.0  # seconds below threshold to stop
+    min_session_seconds: float = 3.0  # triggers ignored right after the input opens
+
+    trigger_band: dict | None = None  # {"low_hz", "high_hz", "order"}; None = broadband RMS
+
+    bit_depth: int = 16
+    true_peak: bool = True
+    dither: bool = False
+    normalize: dict | None = None  # {"target_lufs", "true_peak_ceiling_db"}
+    postprocess: dict | None = None  # keys of recorder.postprocess; None = off
+    fingerprint: dict | None = None  # {"min_overlap", "recent_takes"}; None = no duplicate detection
+
+    max_output_bytes: int = 12 * 1024 * 1024 * 1024
+    idle_approach_ratio: float = 0.5
+    metering_decimation: int = 8
+
+# =========================
+# Utilidades
+# =========================
+
+def create_level_detector(settings: RecorderSettings):
+    """Level used against the threshold: broadband RMS or band-limited RMS."""
+    band = settings.trigger_band
+    if not band:
+        return rms_level
+    return BandLevel.from_settings(settings.sample_rate, band)
+
+def take_filename(output_dir: str) -> str:
+    """
+    Reserve a new rec_<timestamp>[_n].wav (created empty, so concurrent saves
+    can't get the same name). A base name whose original was removed by a
+    split still has its _takeNN/_trim files and is not reused either.
+    """
+    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    n = 1
+    while True:
+        base = os.path.join(output_dir, f"rec_{ts}" if n == 1 else f"rec_{ts}_{n}")
+        n += 1
+        try:
+            open(base + ".wav", "xb").close()
+        except FileExistsError:
+            continue
+        # the split outputs are written before the original goes away
+        if glob.glob(glob.escape(base) + "_take*.wav") or os.path.exists(base + "_trim.wav"):
+            os.remove(base + ".wav")
+            continue
+        return base + ".wav"
+
+def write_sidecar(wav_path: str, data: dict) -> None:
+    """rec_xxx.wav -> rec_xxx.json with the take statistics."""
+    with open(os.path.splitext(wav_path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+# =========================
+# Audio source
+# =========================
+
+class CallbackSource:
+    """
+    Async iterator of mono float32 blocks fed from another thread, typically a
+    PortAudio callback: `source.push(downmix(indata, channel))`. Blocks pushed
+    while the queue is full (or before iteration starts) are dropped and counted.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._queue = asyncio.Queue(maxsize)
+        self._loop = None
+        self.dropped = 0
+
+    def push(self, block: np.ndarray) -> None:
+        if self._loop is None:
+            self.dropped += 1
+            return
+        self._loop.call_soon_threadsafe(self._put, block)
+
+    def close(self) -> None:
+        """End the iteration once the queued blocks are consumed."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._put, None)
+
+    def _put(self, block):
+        try:
+            self._queue.put_nowait(block)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def __aiter__(self):
+        self._loop = asyncio.get_running_loop()
+        return self
+
+    async def __anext__(self) -> np.ndarray:
+        block = await self._queue.get()
+        if block is None:
+            raise StopAsyncIteration
+        return block
+
+# =========================
+# Engine
+# =========================
+
+class RecorderEngine:
+    """
+    Trigger / record / save state machine with no config, hardware or audio
+    device dependencies, so several can run in one process.
+
+    Sync use: call handle_block() (or handle_batch()) with every mono block.
+    Async use: `await engine.start(source)` with any async iterable of blocks,
+    then `await engine.wait_take()` / `await engine.stop()`; file writing
+    then runs in the loop's default executor.
+
+    close() stops the fingerprint / postprocess worker threads once their
+    queued takes are done; call it when discarding an engine.
+
+    Sinks are callables `sink(kind, event)` for RECORDING_STARTED,
+    RECORDING_STOPPED and TAKE_SAVED. They run on the thread that caused the
+    event (audio loop, save executor, fingerprint or postprocess worker) and
+    must not block.
+    """
+
+    def __init__(self, settings: RecorderSettings, sinks=(), logger=None):
+        # checked here rather than at the first save, which would lose the take
+        if settings.bit_depth not in BIT_DEPTHS:
+            raise ValueError(f"Profundidade de bits não suportada: {settings.bit_depth}")
+
+        self.settings = settings
+        self.sinks = list(sinks)
+        self.logger = logger or logging.getLogger(__name__)
+        self.name = settings.name
+
+        # --- recorder state ---
+        self.auto_record = settings.auto_record
+        self.manual_record = False
+        self.forced_record = False
+        self.recording = False
+        self.armed = True
+        self._metering_count = 0
+
+        # --- threshold ---
+        self.threshold = settings.threshold
+        self.level_detector = create_level_detector(settings)
+        self.last_level = None
+
+        # --- buffers ---
+        self.recorded_blocks = []
+        self.take_stats = None
+        self.take_marks = []
+        self.silence_samples = 0
+        self.max_silence_samples = int(settings.stop_seconds * settings.sample_rate)
+        self.prebuffer_size = int(settings.trigger_duration * settings.sample_rate / settings.block_size)
+        self.prebuffer = []
+        self.trigger_samples = 0
+        self.min_trigger_samples = int(settings.trigger_duration * settings.sample_rate)
+
+        # session clock starts with the first block
+        self._session_started_at = None
+
+        # trim/split runs on its own thread and emits TAKE_SAVED when done
+        postprocess = settings.postprocess
+        self.postprocessor = None
+        if postprocess and postprocess.get("enabled", True):
+            # trimmed against the trigger threshold, so measured the same way
+            self.postprocessor = PostProcessor(self._postprocessed, postprocess, band=settings.trigger_band)
+
+        # duplicate detection: fingerprinted on its own thread while recording,
+        # checked against the final takes after postprocessing
+        fingerprint = settings.fingerprint
+        self.duplicates = None
+        self._take_id = 0
+        if fingerprint and fingerprint.get("enabled", True):
+            self.duplicates = DuplicateDetector(
+                self._take_saved,
+                os.path.join(settings.output_dir, FINGERPRINT_DIR),
+                settings.sample_rate,
+                fingerprint["min_overlap"],
+                fingerprint.get("recent_takes", RECENT_TAKES),
+            )
+
+        # takes written but not yet through fingerprint/postprocess (TAKE_SAVED pending)
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+        # --- async mode ---
+        self._loop = None
+        self._task = None
+        self._saves = set()
+        self._waiters = []
+
+        os.makedirs(settings.output_dir, exist_ok=True)
+
+    # =========================
+    # Events
+    # =========================
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+
+    def _emit(self, kind: str, event: dict):
+        for sink in self.sinks:
+            try:
+                sink(kind, event)
+            except Exception as e:
+                self.logger.error(f"Erro no sink {sink!r} ({kind}): {e}", exc_info=True)
+
+    def _saved(self, event: dict, trim_threshold: float, take_id: int):
+        if self.postprocessor:
+            self.postprocessor.submit(event, trim_threshold, take_id)
+        else:
+            self._postprocessed(event, take_id)
+
+    def _postprocessed(self, event: dict, take_id: int):
+        if self.duplicates:
+            self.duplicates.check(take_id, event)
+        else:
+            self._take_saved(event)
+
+    def _take_saved(self, event: dict):
+        try:
+            self._emit(TAKE_SAVED, event)
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._resolve_waiters, event)
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until every saved take has emitted TAKE_SAVED; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def close(self) -> None:
+        """Let queued fingerprint/postprocess work finish, then stop the worker threads."""
+        # the postprocessor feeds fingerprinting, so it drains first
+        if self.postprocessor:
+            self.postprocessor.close()
+            self.postprocessor = None
+        if self.duplicates:
+            self.duplicates.close()
+            self.duplicates = None
+
+    def _resolve_waiters(self, event: dict):
+        waiters, self._waiters = self._waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(event)
+
+    # =========================
+    # Controls
+    # =========================
+
+    def set_threshold(self, value: float) -> float:
+        """Clamped to [min_threshold, max_threshold]; returns the value applied."""
+        self.threshold = max(self.settings.min_threshold, min(self.settings.max_threshold, value))
+        return self.threshold
+
+    def set_auto_record(self, enabled: bool) -> None:
+        self.auto_record = enabled
+
+    def set_manual(self, enabled: bool) -> None:
+        """Manual record on/off: starts a take now, or ends the current one."""
+        self.manual_record = enabled
+        if enabled:
+            if not self.recording:
+                self.logger.info("Gravação manual iniciada")
+                self.start_recording()
+        elif self.recording and not self.forced_record:
+            self.logger.info("Gravação manual encerrada")
+            self.stop_and_save()
+
+    def set_forced(self, enabled: bool) -> None:
+        """Booked window: records regardless of level until disabled."""
+        self.forced_record = enabled
+        if enabled:
+            if not self.recording:
+                self.start_recording()
+        elif self.recording and not self.manual_record:
+            self.stop_and_save()
+
+    def mark(self, label: str | None = None) -> float:
+        """Marker at the current position of the take; returns seconds from the start of the file."""
+        if not self.recording:
+            raise RuntimeError("Nenhuma gravação em andamento")
+        position = round(self.take_stats.frames / self.settings.sample_rate, 3)
+        self.take_marks.append({"time": position, "label": label})
+        return position
+
+    def arm(self, armed: bool) -> None:
+        """Disarmed: auto record can't trigger and blocks are only metered."""
+        if armed == self.armed:
+            return
+        self.armed = armed
+        self.prebuffer.clear()
+        self.trigger_samples = 0
+        if hasattr(self.level_detector, "reset"):
+            self.level_detector.reset()
+
+    def session_uptime(self) -> float:  # seconds
+        if self._session_started_at is None:
+            return 0.0
+        return monotonic() - self._session_started_at
+
+    # =========================
+    # Audio handling
+    # =========================
+
+    def handle_block(self, block: np.ndarray, level=None):
+        if self._session_started_at is None:
+            self._session_started_at = monotonic()
+
+        # disarmed: metering only, level on every Nth block
+        if self._metering():
+            self._metering_count += 1
+            if self._metering_count % self.settings.metering_decimation == 0:
+                self.last_level = rms_level(block)
+            return
+
+        # calc rms level before processing for logging and monitoring purposes
+        if level is None:
+            level = self.level_detector(block)
+        self.last_level = level
+
+        # prioridade: manual record / janela forçada
+        if self.manual_record or self.forced_record:
+            if self.recording:
+                self.record_block(block)
+            return
+
+        # auto record normal
+        if not self.auto_record and not self.recording:
+            return
+
+        if self.recording:
+            self.record_block(block)
+
+            if level < self.threshold:
+                self.silence_samples += len(block)
+                if self.silence_samples >= self.max_silence_samples:
+                    self.stop_and_save()
+            else:
+                self.silence_samples = 0
+
+        else:
+            self.prebuffer.append(block)
+            if len(self.prebuffer) > self.prebuffer_size:
+                self.prebuffer.pop(0)
+
+            if level >= self.threshold:
+                self.trigger_samples += len(block)
+                if self.trigger_samples >= self.min_trigger_samples:
+                    self.start_recording()
+            else:
+                self.trigger_samples = 0
+
+    def _metering(self) -> bool:
+        return not self.armed and not self.recording and not self.manual_record
+
+    def can_batch(self) -> bool:
+        # disarmed metering, or only the prebuffer is being fed and no trigger is building up
+        return self._metering() or (
+            self.auto_record
+            and self.armed
+            and not self.recording
+            and not self.manual_record
+            and not self.forced_record
+            and self.trigger_samples == 0
+        )
+
+    def handle_batch(self, blocks: list):
+        if self._session_started_at is None:
+            self._session_started_at = monotonic()
+
+        if self._metering():
+            # one level per batch: the consumer already wakes up only once per batch
+            self._metering_count += len(blocks)
+            self.last_level = rms_level(blocks[-1])
+            return
+
+        if not self.can_batch() or any(len(block) != self.settings.block_size for block in blocks):
+            for block in blocks:
+                self.handle_block(block)
+            return
+
+        stacked = np.stack(blocks)
+        if hasattr(self.level_detector, "levels"):
+            levels = self.level_detector.levels(stacked)
+        else:
+            levels = rms_levels(stacked)
+
+        if levels.max() >= self.threshold * self.settings.idle_approach_ratio:
+            # close to the threshold: exact per-block path, reusing the levels already computed
+            for block, level in zip(blocks, levels):
+                self.handle_block(block, level)
+            return
+
+        # every block well below the threshold: same end state as handle_block on each
+        self.last_level = levels[-1]
+        self.prebuffer.extend(blocks)
+        if len(self.prebuffer) > self.prebuffer_size:
+            del self.prebuffer[:len(self.prebuffer) - self.prebuffer_size]
+
+    def record_block(self, block: np.ndarray):
+        self.recorded_blocks.append(block)
+        self.take_stats.update(block)
+        if self.duplicates:
+            self.duplicates.feed(block)
+
+    # =========================
+    # Start/Stop recording
+    # =========================
+
+    def start_recording(self):
+        if self.session_uptime() < self.settings.min_session_seconds:
+            self.logger.debug(
+                f"Ignorando gatilho pois a sessão é muito recente (< {self.settings.min_session_seconds:g}s)"
+            )
+            self.prebuffer.clear()
+            self.trigger_samples = 0
+            return
+
+        self.take_stats = TakeStats(self.settings.sample_rate, true_peak=self.settings.true_peak)
+        self.take_marks = []
+        self.recorded_blocks = []
+        self._take_id += 1
+        if self.duplicates:
+            self.duplicates.start_take(self._take_id)
+        for block in self.prebuffer:
+            self.record_block(block)
+        self.prebuffer.clear()
+        self.recording = True
+        self.silence_samples = 0
+        self.trigger_samples = 0
+        self.logger.info("Gravação iniciada")
+        self._emit(RECORDING_STARTED, {"device": self.name})
+
+    def stop_and_save(self):
+        take = self._detach_take()
+        if take is None:
+            return
+
+        if self._loop is not None:
+            # async mode: encoding and file I/O off the event loop
+            future = self._loop.run_in_executor(None, self._save_take, *take)
+            self._saves.add(future)
+            future.add_done_callback(self._saves.discard)
+        else:
+            self._save_take(*take)
+
+    def _detach_take(self):
+        """End the take; returns (blocks, stats, marks, take id) to save, or None when there is nothing to save."""
+        self.recording = False
+        self.silence_samples = 0
+        blocks, self.recorded_blocks = self.recorded_blocks, []
+        self._emit(RECORDING_STOPPED, {"device": self.name})
+
+        if self.duplicates:
+            self.duplicates.finish_take(self._take_id)
+
+        if not blocks:
+            self.logger.warning("Nenhum dado gravado para salvar.")
+        elif self.should_save():
+            return blocks, self.take_stats, self.take_marks, self._take_id
+
+        if self.duplicates:
+            self.duplicates.discard(self._take_id)
+        return None
+
+    def _save_take(self, blocks: list, take_stats: TakeStats, marks: list, take_id: int):
+        try:
+            self._write_take(blocks, take_stats, marks, take_id)
+        except BaseException:
+            if self.duplicates:
+                self.duplicates.discard(take_id)
+            raise
+
+    def _write_take(self, blocks: list, take_stats: TakeStats, marks: list, take_id: int):
+        settings = self.settings
+
+        stats = take_stats.summary()
+        if marks:
+            stats["marks"] = marks
+        gain = 1.0
+        if settings.normalize and settings.normalize.get("enabled", True):
+            gain = take_stats.normalization_gain(
+                settings.normalize["target_lufs"], settings.normalize["true_peak_ceiling_db"]
+            )
+            stats["gain_db"] = round(20 * math.log10(gain), 2)
+
+        if stats["clipped_samples"]:
+            self.logger.warning(f"Take com {stats['clipped_samples']} amostras clipadas")
+
+        # chunks of blocks through one reused conversion buffer (no whole-take temporaries)
+        bits = settings.bit_depth
+        converter = PcmConverter(bits, settings.block_size * SAVE_CHUNK_BLOCKS, gain=gain, dither=settings.dither)
+        filename = take_filename(settings.output_dir)
+        with WavWriter(filename, settings.sample_rate, bits=bits, float_format=bits == 32) as writer:
+            for i in range(0, len(blocks), SAVE_CHUNK_BLOCKS):
+                writer.write(converter.convert(blocks[i:i + SAVE_CHUNK_BLOCKS]))
+
+        stats["bit_depth"] = bits
+        write_sidecar(filename, stats)
+
+        duration = writer.frames / settings.sample_rate
+        self.logger.info(f"Gravado: {filename} ({duration:.1f}s)")
+
+        event = {
+            "file": filename,
+            "duration": duration,
+            "device": self.name,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "stats": stats,
+        }
+
+        # the file is written with `gain` applied: trim against the trigger
+        # threshold on the same scale
+        trim_threshold = self.threshold * gain
+
+        with self._idle:
+            self._in_flight += 1
+
+        self._saved(event, trim_threshold, take_id)
+
+    # =========================
+    # Check disk space
+    # =========================
+
+    def should_save(self) -> bool:
+        output_dir = self.settings.output_dir
+        try:
+            total_size = 0
+            for filename in os.listdir(output_dir):
+                if filename.endswith(".wav"):
+                    total_size += os.path.getsize(os.path.join(output_dir, filename))
+            if total_size > self.settings.max_output_bytes:
+                self.logger.warning("Gravação descartada (espaço insuficiente)")
+                return False
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao verificar espaço: {e}")
+            #later: display on oled error
+            return False
+
+    # =========================
+    # Async API
+    # =========================
+
+    async def start(self, source) -> None:
+        """Consume `source` (async iterable of mono float32 blocks) in a background task."""
+        if self._task is not None and not self._task.done():
+            raise RuntimeError("Engine já iniciado")
+
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._consume(source), name=f"recorder-{self.name}")
+
+    async def _consume(self, source):
+        async for block in source:
+            self.handle_block(block)
+
+    async def stop(self, save: bool = True) -> None:
+        """
+        Stop consuming; the current take is saved (or dropped), and returns once
+        every saved take has gone through fingerprint/postprocess (TAKE_SAVED emitted).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self.recording:
+            if save:
+                self.stop_and_save()
+            else:
+                self.recording = False
+                self.recorded_blocks = []
+                if self.duplicates:
+                    self.duplicates.finish_take(self._take_id)
+                    self.duplicates.discard(self._take_id)
+                self._emit(RECORDING_STOPPED, {"device": self.name})
+
+        if self._saves:
+            await asyncio.gather(*self._saves)
+
+        # fingerprint / postprocess of the takes just written
+        await asyncio.get_running_loop().run_in_executor(None, self.wait_idle)
+
+    async def wait_take(self, timeout: float | None = None) -> dict:
+        """Next TAKE_SAVED event (after duplicate detection and postprocessing, when enabled)."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        self._waiters.append(future)
+        return await asyncio.wait_for(future, timeout)
+
+    async def start_manual(self) -> None:
+        self.set_manual(True)
+
+    async def stop_manual(self) -> None:
+        self.set_manual(False)
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from src import config
+from src.utils import send_ntfy_notification
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuração
+# =========================
+
+OUTPUT_DIR = config.get("recorder")["output_dir"]
+CATALOG_FILE = os.path.join(OUTPUT_DIR, "catalog.jsonl")
+
+DELETE_OLD_FILES = config.get("recorder")["files"]["delete_old_files"]
+DAYS_TO_KEEP = config.get("recorder")["files"]["days_to_keep"]
+RETENTION_INTERVAL_SECONDS = 60 * 60
+
+_catalog_lock = threading.Lock()
+
+# =========================
+# Catalog / notifier
+# =========================
+
+def append_catalog(entry: dict) -> None:
+    """Append one saved take to catalog.jsonl (one JSON object per line)."""
+    with _catalog_lock:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        with open(CATALOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def notify_saved(event: dict) -> None:
+    """Everything that happens once a take is on disk: catalog + ntfy."""
+    try:
+        append_catalog(event)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar catálogo: {e}")
+
+    device = f"[{event['device']}] " if event.get("device") else ""
+    takes = f", {len(event['takes'])} takes" if len(event.get("takes", [])) > 1 else ""
+    duplicate = event.get("duplicate_of")
+    duplicate = f" - sobrepõe {duplicate['file']} ({duplicate['overlap']:.0%})" if duplicate else ""
+    send_ntfy_notification(
+        f"{device}Gravado: {event['file']} ({event['duration']:.1f}s{takes}){duplicate}",
+        tags=["studio_microphone"],
+    )
+
+# =========================
+# Retention
+# =========================
+
+def delete_old_recordings(root: str = OUTPUT_DIR, days: int = DAYS_TO_KEEP) -> list:
+    """Delete rec_* files (takes and their sidecars) older than `days`, in every subdirectory."""
+    cutoff = time.time() - days * 24 * 60 * 60
+    deleted = []
+
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.startswith("rec_"):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    deleted.append(path)
+            except OSError as e:
+                logger.error(f"Erro ao apagar {path}: {e}")
+
+    return deleted
+
+
+class RetentionWorker:
+    """Background thread applying recorder.files.days_to_keep once per interval."""
+
+    def __init__(self, interval=RETENTION_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="retention",
+            daemon=True
+        )
+
+    def start(self):
+        if not DELETE_OLD_FILES:
+            return
+        self._thread.start()
+        logger.info(f"Retenção ativa: apagando gravações com mais de {DAYS_TO_KEEP} dias")
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            deleted = delete_old_recordings()
+            if deleted:
+                logger.info(f"Retenção: {len(deleted)} arquivos antigos apagados")
+            self._stop_event.wait(self.interval)
+
+    def close(self):
+        self._stop_event.set()
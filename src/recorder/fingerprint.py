@@ -0,0 +1,387 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.085  # ~4096 samples at 48 kHz, 50% overlap
+BANDS_HZ = ((300, 600), (600, 1200), (1200, 2400), (2400, 4800))  # one peak per band per frame
+PEAK_PROMINENCE = 3.0  # peak magnitude over the band mean
+SILENCE_RMS = 1e-4  # frames below this (~ -80 dBFS) give no peaks
+FAN_OUT = 3  # following peaks each anchor is paired with (~8k hashes per minute)
+MAX_DT = 63  # frames; 6 bits in the hash
+
+MAX_HASH_TAKES = 200  # hashes in more index entries than this carry no information
+MIN_MATCHES = 20  # aligned hashes needed before a match counts at all
+RECENT_TAKES = 20  # takes compared against; duplicates are adjacent takes overlapping
+
+# =========================
+# Fingerprint
+# =========================
+
+class Fingerprinter:
+    """
+    Spectral-peak fingerprint of a take, fed block by block.
+
+    Each frame keeps its strongest bin per band; pairs of peaks close in time
+    become 26-bit hashes (f1, f2, dt) stored with the anchor frame, so two
+    recordings of the same audio share hashes at a constant frame offset.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.frame = 1 << int(round(np.log2(sample_rate * FRAME_SECONDS)))
+        self.hop = self.frame // 2
+        self._window = np.hanning(self.frame).astype(np.float32)
+
+        bin_hz = sample_rate / self.frame
+        self._bands = [
+            (int(low / bin_hz), min(int(high / bin_hz), self.frame // 2))
+            for low, high in BANDS_HZ
+            if low < sample_rate / 2
+        ]
+
+        self._pending = []
+        self._pending_len = 0
+        self._frames_done = 0
+        self._peak_t = []
+        self._peak_f = []
+
+    def update(self, block: np.ndarray) -> None:
+        self._pending.append(block)
+        self._pending_len += len(block)
+        if self._pending_len >= self.frame * 16:
+            self._process()
+
+    def _process(self):
+        if self._pending_len < self.frame:
+            return
+        n_frames = (self._pending_len - self.frame) // self.hop + 1
+
+        samples = np.concatenate(self._pending)
+        rest = samples[n_frames * self.hop:]  # tail overlaps the next frame
+        self._pending = [rest]
+        self._pending_len = len(rest)
+
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.frame)[::self.hop][:n_frames]
+        loud = np.sqrt(np.mean(frames * frames, axis=1)) >= SILENCE_RMS
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1))
+
+        for low, high in self._bands:
+            band = spectrum[:, low:high]
+            peak = band.argmax(axis=1)
+            strong = band[np.arange(n_frames), peak] > PEAK_PROMINENCE * band.mean(axis=1)
+            t = np.flatnonzero(loud & strong)
+            self._peak_t.append(t + self._frames_done)
+            self._peak_f.append(peak[t] + low)
+
+        self._frames_done += n_frames
+
+    def finish(self):
+        """(hashes, anchor frames) as uint32 arrays; the fingerprinter is spent afterwards."""
+        self._process()
+        if not self._peak_t:
+            return np.empty(0, np.uint32), np.empty(0, np.uint32)
+
+        t = np.concatenate(self._peak_t)
+        f = np.concatenate(self._peak_f)
+        order = np.lexsort((f, t))
+        t, f = t[order], f[order]
+
+        hashes, anchors = [], []
+        for k in range(1, FAN_OUT + 1):
+            dt = t[k:] - t[:-k]
+            ok = (dt >= 1) & (dt <= MAX_DT)
+            f1, f2 = f[:-k][ok], f[k:][ok]
+            hashes.append(((f1 & 0x3FF) << 16) | ((f2 & 0x3FF) << 6) | dt[ok])
+            anchors.append(t[:-k][ok])
+
+        return np.concatenate(hashes).astype(np.uint32), np.concatenate(anchors).astype(np.uint32)
+
+
+# =========================
+# Index
+# =========================
+
+class FingerprintIndex:
+    """
+    Fingerprints of the most recent `max_takes` takes in `directory` (one
+    rec_xxx.npy per take, so retention removes them together with the audio),
+    searched through one hash-sorted array rebuilt whenever takes are added
+    or disappear. Older fingerprints are never compared again and are deleted,
+    so memory and rebuild time stay bounded however long the box records.
+    """
+
+    def __init__(self, directory: str, max_takes: int = RECENT_TAKES):
+        self.directory = directory
+        self.max_takes = max_takes
+        self._takes = {}  # name -> (hashes, anchors)
+        self._dirty = True
+        self._hashes = self._anchors = self._ids = None
+        self._names = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".npy")
+
+    def refresh(self) -> None:
+        """Pick up recent fingerprints written by earlier runs, forget deleted or old ones."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".npy")),
+            key=_mtime,
+            reverse=True,
+        )
+        for entry in entries[self.max_takes:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        on_disk = {entry.name[:-4] for entry in entries[:self.max_takes]}
+
+        for name in set(self._takes) - on_disk:
+            del self._takes[name]
+            self._dirty = True
+
+        for name in on_disk - set(self._takes):
+            try:
+                data = np.load(self._path(name))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Fingerprint ilegível {name}: {e}")
+                continue
+            self._takes[name] = (data[0], data[1])
+            self._dirty = True
+
+    def add(self, name: str, hashes: np.ndarray, anchors: np.ndarray) -> None:
+        """Index a take (the oldest one beyond max_takes goes at the next refresh)."""
+        np.save(self._path(name), np.stack((hashes, anchors)))
+        self._takes[name] = (hashes, anchors)
+        self._dirty = True
+
+    def _rebuild(self):
+        self._names = list(self._takes)
+        if self._names:
+            hashes = np.concatenate([self._takes[n][0] for n in self._names])
+            anchors = np.concatenate([self._takes[n][1] for n in self._names])
+            ids = np.repeat(np.arange(len(self._names)), [len(self._takes[n][0]) for n in self._names])
+        else:
+            hashes = anchors = ids = np.empty(0, np.uint32)
+
+        order = np.argsort(hashes, kind="stable")
+        self._hashes, self._anchors, self._ids = hashes[order], anchors[order], ids[order]
+        self._dirty = False
+
+    def best_match(self, hashes: np.ndarray, anchors: np.ndarray):
+        """
+        (name, overlap) of the indexed take sharing the most hashes at one time
+        offset, overlap being that count over the shorter fingerprint; None when
+        nothing reaches MIN_MATCHES.
+        """
+        if self._dirty:
+            self._rebuild()
+        if len(hashes) == 0 or len(self._hashes) == 0:
+            return None
+
+        left = np.searchsorted(self._hashes, hashes, side="left")
+        right = np.searchsorted(self._hashes, hashes, side="right")
+        counts = right - left
+        keep = (counts > 0) & (counts <= MAX_HASH_TAKES)
+        if not keep.any():
+            return None
+
+        left, counts, query_t = left[keep], counts[keep], anchors[keep].astype(np.int64)
+
+        # every (query hash, index entry) pair with the same hash
+        starts = np.repeat(left - np.cumsum(counts) + counts, counts)
+        rows = starts + np.arange(counts.sum())
+        ids = self._ids[rows].astype(np.int64)
+        offsets = self._anchors[rows].astype(np.int64) - np.repeat(query_t, counts)
+
+        # votes per (take, offset); a copy not aligned to our frames lands peaks
+        # one frame early or late, so adjacent offsets are counted together
+        keys, votes = np.unique(ids * (1 << 32) + (offsets + (1 << 31)), return_counts=True)
+        score = votes.copy()
+        neighbour = keys[1:] - keys[:-1] == 1
+        score[:-1][neighbour] += votes[1:][neighbour]
+        best = score.argmax()
+        if score[best] < MIN_MATCHES:
+            return None
+
+        name = self._names[int(keys[best] >> 32)]
+        shorter = min(len(hashes), len(self._takes[name][0]))
+        return name, min(1.0, score[best] / shorter)
+
+# =========================
+# Worker
+# =========================
+
+class DuplicateDetector:
+    """
+    Single background worker fed while recording: the take's blocks are
+    fingerprinted as they arrive (feed), so nothing is held after the save.
+    Once the take is saved and postprocessed, check() looks every final take
+    up in the index, adds `duplicate_of` to its sidecar and to the event when
+    it overlaps an earlier take by at least `min_overlap`, indexes the final
+    takes and calls `on_done(event, *args)` on the worker thread.
+
+    Calls for one take: start_take, feed..., finish_take, then check or discard.
+    """
+
+    def __init__(self, on_done, directory: str, sample_rate: int, min_overlap: float,
+                 recent_takes: int = RECENT_TAKES):
+        self.on_done = on_done
+        self.sample_rate = sample_rate
+        self.min_overlap = min_overlap
+        self.index = FingerprintIndex(directory, recent_takes)
+
+        self._current = None  # Fingerprinter of the take being recorded
+        self._finished = {}  # take id -> (hashes, anchors, seconds per anchor frame)
+
+        self._jobs = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="fingerprint",
+            daemon=True
+        )
+        self._thread.start()
+
+    # ---------- audio thread ----------
+
+    def start_take(self, take_id) -> None:
+        self._jobs.put(("start", take_id))
+
+    def feed(self, block) -> None:
+        self._jobs.put(("block", block))
+
+    def finish_take(self, take_id) -> None:
+        self._jobs.put(("finish", take_id))
+
+    def discard(self, take_id) -> None:
+        """Take not saved: drop its fingerprint."""
+        self._jobs.put(("discard", take_id))
+
+    # ---------- after save ----------
+
+    def check(self, take_id, event: dict, *args) -> None:
+        self._jobs.put(("check", take_id, event, args))
+
+    def close(self) -> None:
+        """Finish the queued jobs, then stop the worker."""
+        self._jobs.put(None)
+        self._thread.join()
+
+    # =========================================================
+
+    def _loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+
+            kind = job[0]
+            if kind == "block":
+                if self._current is not None:
+                    self._current.update(job[1])
+
+            elif kind == "start":
+                self._current = Fingerprinter(self.sample_rate)
+
+            elif kind == "finish":
+                if self._current is not None:
+                    frame_seconds = self._current.hop / self.sample_rate
+                    self._finished[job[1]] = (*self._current.finish(), frame_seconds)
+                    self._current = None
+
+            elif kind == "discard":
+                self._finished.pop(job[1], None)
+
+            elif kind == "check":
+                _, take_id, event, args = job
+                try:
+                    self._check(self._finished.pop(take_id), event)
+                except Exception as e:
+                    logger.error(f"Erro no fingerprint de {event['file']}: {e}", exc_info=True)
+                self.on_done(event, *args)
+
+    def _check(self, fingerprint, event: dict):
+        hashes, anchors, frame_seconds = fingerprint
+        takes = event.get("takes") or [event["file"]]
+
+        # look every final take up before indexing any, so they don't match each other
+        found = []
+        for path in takes:
+            take_hashes, take_anchors = _slice_take(hashes, anchors, frame_seconds, path)
+            found.append((path, take_hashes, take_anchors, self._lookup(take_hashes, take_anchors)))
+
+        best = None
+        for path, take_hashes, take_anchors, match in found:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if match and match[1] >= self.min_overlap:
+                other, overlap = match
+                duplicate = {
+                    "file": os.path.join(os.path.dirname(path), other + ".wav"),
+                    "overlap": round(float(overlap), 3),
+                }
+                _update_sidecar(path, {"duplicate_of": duplicate})
+                logger.warning(f"Take {name} sobrepõe {other} ({overlap:.0%})")
+
+                if best is None or duplicate["overlap"] > best["overlap"]:
+                    best = {**duplicate, "take": path} if len(takes) > 1 else duplicate
+
+            self.index.add(name, take_hashes, take_anchors)
+
+        if best:
+            event["duplicate_of"] = best
+
+    def _lookup(self, hashes, anchors):
+        self.index.refresh()
+        return self.index.best_match(hashes, anchors)
+
+
+def _mtime(entry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except OSError:  # removed meanwhile (retention)
+        return 0.0
+
+
+def _sidecar_path(path) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _slice_take(hashes, anchors, frame_seconds: float, path):
+    """
+    Hashes of the part of the recording kept in `path`, with anchors made
+    relative to its start. Postprocessed takes carry "offset"/"duration"
+    (seconds into the recording) in their sidecar; otherwise it is all of it.
+    """
+    try:
+        with open(_sidecar_path(path), encoding="utf-8") as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        sidecar = {}
+
+    offset = sidecar.get("offset")
+    if offset is None:
+        return hashes, anchors
+
+    first = int(round(offset / frame_seconds))
+    last = first + int(round(sidecar["duration"] / frame_seconds))
+    keep = (anchors >= first) & (anchors < last)
+    return hashes[keep], (anchors[keep] - first).astype(np.uint32)
+
+
+def _update_sidecar(path, data: dict) -> None:
+    try:
+        with open(_sidecar_path(path), encoding="utf-8") as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        sidecar = {}
+    sidecar.update(data)
+    try:
+        with open(_sidecar_path(path), "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, indent=4)
+    except OSError as e:
+        logger.error(f"Erro ao atualizar sidecar de {path}: {e}")
@@ -0,0 +1,200 @@
+import math
+
+import numpy as np
+from scipy.signal import firwin, sosfilt, upfirdn
+
+# BS.1770 / EBU R128
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU below the absolute-gated loudness
+GATE_BLOCK_SECONDS = 0.4
+GATE_STEP_SECONDS = 0.1  # 75% overlap
+
+HIST_MAX = 10.0  # LUFS
+HIST_STEP = 0.1  # LU per histogram bin
+
+TRUE_PEAK_OVERSAMPLE = 4
+TRUE_PEAK_TAPS = 12 * TRUE_PEAK_OVERSAMPLE + 1  # odd: whole-sample group delay
+
+# =========================
+# Utilidades
+# =========================
+
+def k_weighting_sos(sample_rate: int) -> np.ndarray:
+    """
+    BS.1770 K-weighting (high shelf + RLB high-pass) as two biquads for any
+    rate; same derivation as libebur128, matches the spec table at 48 kHz.
+    """
+    # shelf
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (vh + vb * k / q + k * k) / a0,
+        2 * (k * k - vh) / a0,
+        (vh - vb * k / q + k * k) / a0,
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    ]
+
+    # high-pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = [
+        1.0, -2.0, 1.0,
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    ]
+
+    return np.array([shelf, highpass])
+
+
+def to_db(value: float) -> float | None:
+    return round(20 * math.log10(value), 2) if value > 0 else None
+
+# =========================
+# Take statistics
+# =========================
+
+class TakeStats:
+    """
+    Per-take statistics updated block by block while recording, so nothing
+    needs a second pass over the audio at save time:
+
+    - sample peak and clipped-sample count (|x| >= 1.0)
+    - true peak (4x oversampled, BS.1770 annex 2 style), optional
+    - integrated loudness with absolute and relative gating; gating blocks go
+      into a fixed-size loudness histogram, so memory doesn't grow with the take
+    """
+
+    def __init__(self, sample_rate: int, true_peak: bool = True):
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self.peak = 0.0
+        self.clipped = 0
+
+        # K-weighting filter state
+        self._sos = k_weighting_sos(sample_rate)
+        self._zi = np.zeros((self._sos.shape[0], 2))
+
+        # gating: sum of squares per 100 ms step, 4 steps make a 400 ms block
+        self._step = int(round(GATE_STEP_SECONDS * sample_rate))
+        self._steps_per_block = int(round(GATE_BLOCK_SECONDS / GATE_STEP_SECONDS))
+        self._step_energy = np.zeros(self._steps_per_block)
+        self._step_fill = 0
+        self._acc = 0.0
+        self._steps_done = 0
+
+        n_bins = int(round((HIST_MAX - ABSOLUTE_GATE) / HIST_STEP))
+        self._hist_count = np.zeros(n_bins, dtype=np.int64)
+        self._hist_power = np.zeros(n_bins)
+
+        # true peak: polyphase interpolator + tail of previous block
+        self._tp_filter = None
+        self.true_peak = None
+        if true_peak:
+            self._tp_filter = firwin(TRUE_PEAK_TAPS, 1.0 / TRUE_PEAK_OVERSAMPLE) * TRUE_PEAK_OVERSAMPLE
+            self._tp_tail = np.zeros(TRUE_PEAK_TAPS // TRUE_PEAK_OVERSAMPLE, dtype=np.float32)
+            self.true_peak = 0.0
+
+    # =========================================================
+
+    def update(self, block: np.ndarray) -> None:
+        n = len(block)
+        self.frames += n
+
+        magnitude = np.abs(block)
+        block_peak = float(magnitude.max())
+        if block_peak > self.peak:
+            self.peak = block_peak
+        if block_peak >= 1.0:
+            self.clipped += int(np.count_nonzero(magnitude >= 1.0))
+
+        if self._tp_filter is not None:
+            self._update_true_peak(block)
+
+        weighted, self._zi = sosfilt(self._sos, block, zi=self._zi)
+        self._accumulate(weighted)
+
+    def _update_true_peak(self, block: np.ndarray):
+        history = np.concatenate((self._tp_tail, block))
+        upsampled = upfirdn(self._tp_filter, history, up=TRUE_PEAK_OVERSAMPLE)
+        # evaluated positions lag half a filter behind the block edge, so every
+        # output sample has full context on both sides (filter delay = tail / 2)
+        skip = len(self._tp_tail) * TRUE_PEAK_OVERSAMPLE
+        peak = float(np.abs(upsampled[skip:skip + len(block) * TRUE_PEAK_OVERSAMPLE]).max())
+        self.true_peak = max(self.true_peak, peak, self.peak)
+        self._tp_tail[:] = history[-len(self._tp_tail):]
+
+    def _accumulate(self, weighted: np.ndarray):
+        pos = 0
+        n = len(weighted)
+
+        while pos < n:
+            take = min(self._step - self._step_fill, n - pos)
+            chunk = weighted[pos:pos + take]
+            self._acc += float(np.dot(chunk, chunk))
+            self._step_fill += take
+            pos += take
+
+            if self._step_fill == self._step:
+                self._step_energy[self._steps_done % self._steps_per_block] = self._acc
+                self._steps_done += 1
+                self._acc = 0.0
+                self._step_fill = 0
+
+                if self._steps_done >= self._steps_per_block:
+                    self._add_gating_block(self._step_energy.sum() / (self._step * self._steps_per_block))
+
+    def _add_gating_block(self, power: float):
+        if power <= 0:
+            return
+        loudness = -0.691 + 10 * math.log10(power)
+        if loudness < ABSOLUTE_GATE:
+            return
+        index = min(int((loudness - ABSOLUTE_GATE) / HIST_STEP), len(self._hist_count) - 1)
+        self._hist_count[index] += 1
+        self._hist_power[index] += power
+
+    # =========================================================
+
+    def integrated_loudness(self) -> float | None:
+        """LUFS, or None when no gating block is above the absolute gate."""
+        total = self._hist_count.sum()
+        if total == 0:
+            return None
+
+        ungated = -0.691 + 10 * math.log10(self._hist_power.sum() / total)
+        first_bin = max(0, int((ungated + RELATIVE_GATE - ABSOLUTE_GATE) / HIST_STEP))
+
+        count = self._hist_count[first_bin:].sum()
+        if count == 0:
+            return None
+        return -0.691 + 10 * math.log10(self._hist_power[first_bin:].sum() / count)
+
+    def summary(self) -> dict:
+        loudness = self.integrated_loudness()
+        true_peak = to_db(self.true_peak) if self.true_peak is not None else None
+        return {
+            "duration": round(self.frames / self.sample_rate, 3),
+            "peak_dbfs": to_db(self.peak),
+            "true_peak_dbtp": true_peak,
+            "clipped_samples": self.clipped,
+            "integrated_lufs": round(loudness, 2) if loudness is not None else None,
+        }
+
+    def normalization_gain(self, target_lufs: float, ceiling_db: float) -> float:
+        """Linear gain reaching `target_lufs` without pushing the (true) peak over `ceiling_db`."""
+        loudness = self.integrated_loudness()
+        if loudness is None:
+            return 1.0
+
+        gain_db = target_lufs - loudness
+        peak = self.true_peak if self.true_peak is not None else self.peak
+        if peak > 0:
+            gain_db = min(gain_db, ceiling_db - 20 * math.log10(peak))
+        return 10 ** (gain_db / 20)
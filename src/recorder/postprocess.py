@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+
+from src.recorder.trigger import BandLevel
+from src.recorder.wavio import WavWriter, memmap_frames, to_float
+
+logger = logging.getLogger(__name__)
+
+CHUNK_WINDOWS = 1024  # windows analysed per memmap chunk
+COPY_FRAMES = 1 << 18  # frames per write when copying a take out
+
+# =========================
+# Analysis
+# =========================
+
+def window_levels(frames: np.ndarray, window: int, band: BandLevel | None = None) -> np.ndarray:
+    """
+    RMS per non-overlapping window, streaming over a (possibly memory-mapped)
+    (frames, channels) array. Only one chunk is ever converted to float.
+    With `band`, the level of the (mono-mixed) signal inside that band, with
+    the filter state carried across chunks.
+    """
+    n_windows = len(frames) // window
+    levels = np.empty(n_windows, dtype=np.float32)
+
+    for start in range(0, n_windows, CHUNK_WINDOWS):
+        stop = min(start + CHUNK_WINDOWS, n_windows)
+        chunk = to_float(frames[start * window:stop * window])
+        if band is not None:
+            levels[start:stop] = band.levels(chunk.mean(axis=1).reshape(stop - start, window))
+            continue
+        chunk = chunk.reshape(stop - start, -1)
+        levels[start:stop] = np.sqrt(np.einsum("ij,ij->i", chunk, chunk) / chunk.shape[1])
+
+    return levels
+
+
+def find_takes(levels: np.ndarray, threshold: float, window: int, total: int,
+               min_gap: int, pad: int, min_take: int, split: bool = True) -> list:
+    """
+    Frame ranges [(start, stop), ...] of sound above `threshold`.
+    Gaps shorter than `min_gap` frames stay inside a take; each take gets `pad`
+    frames of context on both sides. Without `split`, a single trimmed range.
+    """
+    loud = np.flatnonzero(levels >= threshold)
+    if len(loud) == 0:
+        return []
+
+    if split:
+        # window indices where the silence before the next loud window is long enough
+        breaks = np.flatnonzero(np.diff(loud) * window > min_gap)
+        starts = np.concatenate(([loud[0]], loud[breaks + 1]))
+        stops = np.concatenate((loud[breaks], [loud[-1]])) + 1
+    else:
+        starts, stops = loud[:1], loud[-1:] + 1
+
+    takes = []
+    for s, e in zip(starts * window, stops * window):
+        s, e = max(0, s - pad), min(total, e + pad)
+        if e - s >= min_take:
+            takes.append((int(s), int(e)))
+
+    return takes
+
+# =========================
+# Pipeline
+# =========================
+
+def copy_range(frames: np.ndarray, info: dict, start: int, stop: int, path) -> None:
+    with WavWriter.like(path, info) as writer:
+        for pos in range(start, stop, COPY_FRAMES):
+            writer.write(frames[pos:min(stop, pos + COPY_FRAMES)])
+
+
+def _sidecar_path(path) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def write_take_sidecars(path, outputs: list, takes: list, rate: int) -> None:
+    """
+    Sidecar per output take, derived from the source take's sidecar: duration,
+    offset into the source and the markers that fall inside it. Level stats
+    are kept for a trimmed take (only silence was removed) but not for split
+    takes, where they described the whole source.
+    """
+    try:
+        with open(_sidecar_path(path), encoding="utf-8") as f:
+            source = json.load(f)
+    except (OSError, ValueError):
+        source = {}
+
+    for output, (start, stop) in zip(outputs, takes):
+        offset = start / rate
+        if len(takes) == 1:
+            data = dict(source)
+        else:
+            data = {key: source[key] for key in ("bit_depth", "gain_db") if key in source}
+
+        data["duration"] = round((stop - start) / rate, 3)
+        data["offset"] = round(offset, 3)
+        if output != path:
+            data["source"] = os.path.basename(path)
+
+        marks = [
+            {**mark, "time": round(mark["time"] - offset, 3)}
+            for mark in source.get("marks", [])
+            if start / rate <= mark["time"] < stop / rate
+        ]
+        if marks:
+            data["marks"] = marks
+        else:
+            data.pop("marks", None)
+
+        with open(_sidecar_path(output), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+
+def trim_and_split(path, threshold: float, settings: dict, band: dict | None = None) -> list:
+    """
+    Rewrite `path` as trimmed take(s) without loading it into RAM.
+    `settings` has the keys of recorder.postprocess in config; `band` is the
+    recorder.trigger_band the threshold was set against (None = broadband RMS).
+    Returns the resulting file paths (just `path` when it is kept as-is).
+    """
+    info, frames = memmap_frames(path)
+    rate = info["sample_rate"]
+    window = max(1, int(settings["window_ms"] * rate / 1000))
+
+    levels = window_levels(frames, window, BandLevel.from_settings(rate, band) if band else None)
+    takes = find_takes(
+        levels, threshold, window, len(frames),
+        min_gap=int(settings["min_gap_seconds"] * rate),
+        pad=int(settings["pad_seconds"] * rate),
+        min_take=int(settings["min_take_seconds"] * rate),
+        split=settings["split"],
+    )
+
+    if not takes:
+        logger.info(f"Pós-processamento: nenhum trecho acima do threshold em {path}; mantido")
+        return [path]
+
+    if takes == [(0, len(frames))]:
+        return [path]
+
+    base, ext = os.path.splitext(path)
+    if len(takes) == 1:
+        targets = [f"{base}_trim{ext}" if settings["keep_original"] else f"{base}.tmp{ext}"]
+    else:
+        targets = [f"{base}_take{i:02d}{ext}" for i in range(1, len(takes) + 1)]
+    existing = [target for target in targets if os.path.exists(target)]
+    if existing:
+        raise FileExistsError(f"Pós-processamento não sobrescreve takes existentes: {', '.join(existing)}")
+
+    outputs = []
+
+    for (start, stop), target in zip(takes, targets):
+        copy_range(frames, info, start, stop, target)
+        outputs.append(target)
+
+    del frames  # release the mapping before replacing/removing the file
+
+    if not settings["keep_original"]:
+        if len(takes) == 1:
+            os.replace(outputs[0], path)
+            outputs = [path]
+
+    # written before the original sidecar goes away (it is the source)
+    write_take_sidecars(path, outputs, takes, rate)
+
+    if not settings["keep_original"] and len(takes) > 1:
+        os.remove(path)
+        try:
+            os.remove(_sidecar_path(path))
+        except FileNotFoundError:
+            pass
+
+    kept = sum(stop - start for start, stop in takes) / rate
+    logger.info(f"Pós-processamento: {path} -> {len(outputs)} take(s), {kept:.1f}s de {info['frames'] / rate:.1f}s")
+    return outputs
+
+
+class PostProcessor:
+    """
+    Single background worker running trim_and_split after each save, so the
+    audio loop never waits on it. `on_done(event, *args)` runs on the worker thread.
+    """
+
+    def __init__(self, on_done, settings: dict, band: dict | None = None):
+        self.on_done = on_done
+        self.settings = settings
+        self.band = band
+        self._jobs = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="postprocess",
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, event: dict, threshold: float, *args) -> None:
+        self._jobs.put((event, threshold, args))
+
+    def close(self) -> None:
+        """Finish the queued jobs, then stop the worker."""
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            event, threshold, args = job
+            try:
+                event["takes"] = trim_and_split(event["file"], threshold, self.settings, self.band)
+                if not os.path.exists(event["file"]):
+                    # original removed after a split: point at a file that exists
+                    event["source"] = os.path.basename(event["file"])
+                    event["file"] = event["takes"][0]
+            except Exception as e:
+                logger.error(f"Erro no pós-processamento de {event['file']}: {e}", exc_info=True)
+            self.on_done(event, *args)
@@ -1,15 +1,16 @@
-# src/recorder.py
+from time import monotonic
 
-import os
-from datetime import datetime
-import numpy as np
-from scipy.io.wavfile import write as wav_write
-
-import src.hardware.led_recording as led_rec
-
-from src.monitor import Monitor, rms_level, SAMPLE_RATE, BLOCK_SIZE, get_session_uptime
+from src.monitor import Monitor, SAMPLE_RATE, BLOCK_SIZE, HARDWARE_ENABLED
 from src import config
-from src.utils import send_ntfy_notification
+from src.recorder.engine import RecorderEngine, RecorderSettings, RECORDING_STARTED, RECORDING_STOPPED, TAKE_SAVED
+from src.recorder.files_manager import notify_saved
+from src.recorder.scheduler import Schedule, DISARMED, FORCED
+
+try:
+    import src.hardware.led_recording as led_rec
+    LED_AVAILABLE = True
+except ImportError:
+    LED_AVAILABLE = False
 
 try:
     from src.hardware.toggle_switch import ManualRecordSwitch, GPIO_PIN as MANUAL_SWITCH_PIN
@@ -21,46 +22,65 @@ except ImportError:
 # Configuração
 # =========================
 
-AUTO_RECORD_DEFAULT = config.get("monitor")["auto_record"]
-TRIGGER_DURATION = config.get("recorder")["trigger_duration"]
-SILENCE_SECONDS = config.get("recorder")["stop_seconds"]
-OUTPUT_DIR = config.get("recorder")["output_dir"]
-
-THRESHOLD = config.get("recorder")["threshold"]
-MIN_THRESHOLD = config.get("recorder")["min_threshold"]
-MAX_THRESHOLD = config.get("recorder")["max_threshold"]
 THRESHOLD_STEP = config.get("recorder")["encoder_step"]
 
+SCHEDULE = config.get("schedule")
+SCHEDULE_CHECK_SECONDS = 1.0
+SHUTDOWN_TIMEOUT_SECONDS = 60.0  # postprocess / fingerprint of the last takes
+
 # =========================
 # Utilidades
 # =========================
 
-def ensure_output_dir():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-def current_filename():
-    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    return os.path.join(OUTPUT_DIR, f"rec_{ts}.wav")
-
-def float_to_int16(signal: np.ndarray) -> np.ndarray:
-    signal = np.clip(signal, -1.0, 1.0)
-    return (signal * 32767).astype(np.int16)
+def settings_from_config(name: str | None = None) -> RecorderSettings:
+    """Engine settings from config.json (the values this process was started with)."""
+    recorder = config.get("recorder")
+    monitor = config.get("monitor")
+    band = recorder["trigger_band"]
+
+    return RecorderSettings(
+        output_dir=recorder["output_dir"],
+        sample_rate=SAMPLE_RATE,
+        block_size=BLOCK_SIZE,
+        name=name or config.get("general")["interface_name"],
+        auto_record=monitor["auto_record"],
+        threshold=recorder["threshold"],
+        min_threshold=recorder["min_threshold"],
+        max_threshold=recorder["max_threshold"],
+        trigger_duration=recorder["trigger_duration"],
+        stop_seconds=recorder["stop_seconds"],
+        trigger_band=band if band["enabled"] else None,
+        bit_depth=recorder["bit_depth"],
+        true_peak=recorder["true_peak"],
+        dither=recorder["dither"],
+        normalize=recorder["normalize"] if recorder["normalize"]["enabled"] else None,
+        postprocess=recorder["postprocess"] if recorder["postprocess"]["enabled"] else None,
+        fingerprint=recorder["fingerprint"] if recorder["fingerprint"]["enabled"] else None,
+        idle_approach_ratio=monitor["idle_approach_ratio"],
+        metering_decimation=SCHEDULE["metering_decimation"],
+    )
 
 # =========================
 # Recorder
 # =========================
 
 class Recorder(Monitor):
-    def __init__(self, logger):
+    """
+    Config + hardware adapter around RecorderEngine: encoder, toggle switch,
+    LED, calendar schedule and the sounddevice / shared-memory input loop.
+    """
+
+    def __init__(self, logger, events=None, name=None):
         super().__init__(logger)
 
-        # --- recorder state ---
-        self.auto_record = AUTO_RECORD_DEFAULT
-        self.manual_record = False
-        self.recording = False
+        # supervisor mode: saved takes are reported over IPC instead of notified here
+        self.events = events
 
-        # --- threshold ---
-        self.threshold = THRESHOLD
+        self.engine = RecorderEngine(settings_from_config(name), sinks=[self._on_engine_event], logger=logger)
+
+        # --- schedule ---
+        self.schedule = Schedule.from_config(SCHEDULE) if SCHEDULE["enabled"] else None
+        self._next_schedule_check = 0.0
 
         # Encoder callbacks
         if self.encoder:
@@ -69,7 +89,7 @@ class Recorder(Monitor):
             self.encoder.on_long_press(self._on_encoder_long_press)
 
         # Toggle switch manual
-        if SWITCH_AVAILABLE:
+        if SWITCH_AVAILABLE and HARDWARE_ENABLED:
             self.manual_switch = ManualRecordSwitch(
                 pin=MANUAL_SWITCH_PIN,
                 on_change=self._on_manual_switch,
@@ -77,170 +97,187 @@ class Recorder(Monitor):
             )
         else:
             self.manual_switch = None
-            self.logger.warning("Toggle switch do auto recorder manual não disponível")
+            if HARDWARE_ENABLED:
+                self.logger.warning("Toggle switch do auto recorder manual não disponível")
 
         self.switch_available = SWITCH_AVAILABLE and self.manual_switch is not None
 
-        # --- buffers ---
-        self.recorded_blocks = []
-        self.silence_samples = 0
-        self.max_silence_samples = int(SILENCE_SECONDS * SAMPLE_RATE)
-        self.prebuffer_size = int(TRIGGER_DURATION * SAMPLE_RATE / BLOCK_SIZE)
-        self.prebuffer = []
-        self.trigger_samples = 0
-        self.min_trigger_samples = int(TRIGGER_DURATION * SAMPLE_RATE)
+    # engine state read by Monitor.report_status
+    recording = property(lambda self: self.engine.recording)
+    threshold = property(lambda self: self.engine.threshold)
+    trigger_samples = property(lambda self: self.engine.trigger_samples)
+    silence_samples = property(lambda self: self.engine.silence_samples)
+    last_level = property(lambda self: self.engine.last_level)
 
-        ensure_output_dir()
+    # =========================
+    # Engine events
+    # =========================
+
+    def _on_engine_event(self, kind: str, event: dict):
+        if kind == RECORDING_STARTED:
+            if LED_AVAILABLE and HARDWARE_ENABLED:
+                led_rec.start_blinking()
+        elif kind == RECORDING_STOPPED:
+            if LED_AVAILABLE and HARDWARE_ENABLED:
+                led_rec.stop_blinking()
+        elif kind == TAKE_SAVED:
+            self._publish_saved(event)
+
+    def _publish_saved(self, event: dict):
+        if self.events is not None:
+            self.events.put(event)
+        else:
+            notify_saved(event)
 
     # =========================
-    # Encoder callbacks
+    # Hardware callbacks
     # =========================
+    # called from the encoder / switch polling threads: only queue a command
 
     def _on_threshold_change(self, delta: int):
-        new_threshold = self.threshold + delta * THRESHOLD_STEP
-        new_threshold = max(MIN_THRESHOLD, min(MAX_THRESHOLD, new_threshold))
-
-        if new_threshold != self.threshold:
-            self.threshold = new_threshold
-            self.logger.info(f"Threshold ajustado: {self.threshold:.4f}")
+        self.submit("threshold_step", {"delta": delta})
 
     def _on_button_press(self):
         """Long press ou botão curto do encoder para alternar auto record"""
-        self.auto_record = not self.auto_record
-        self.logger.info(f"Auto Record {'ativado' if self.auto_record else 'desativado'}")
+        self.submit("toggle_auto_record")
 
     def _on_encoder_long_press(self):
-        config.set("recorder.threshold", self.threshold)
-        config.set("monitor.auto_record", self.auto_record)
-        config.save()
-
-        self.logger.info("Configuração salva como padrão")
-    
-    # =========================
-    # Toggle switch callback
-    # =========================
+        self.submit("save_defaults")
 
     def _on_manual_switch(self, state: bool):
         if not self.manual_switch:
             return
 
-        self.manual_record = state
-        if state:
-            if not self.recording:
-                self.logger.info("Gravação manual iniciada")
-                self.start_recording()
-        else:
-            if self.recording:
-                self.logger.info("Gravação manual encerrada")
-                self.stop_and_save()
+        self.submit("manual", {"enabled": state})
 
     # =========================
-    # Audio handling
+    # Commands
     # =========================
+    # run by the audio loop between blocks (see Monitor.submit); the remote
+    # control API only reaches those in control.REMOTE_COMMANDS
+
+    def handle_command(self, name: str, args: dict):
+        command = getattr(self, f"_cmd_{name}", None)
+        if command is None:
+            raise ValueError(f"Comando desconhecido: {name}")
+        return command(**args)
+
+    def _cmd_manual(self, enabled: bool):
+        self.engine.set_manual(bool(enabled))
+        return self.engine.recording
+
+    def _cmd_start_manual(self):
+        return self._cmd_manual(True)
+
+    def _cmd_stop_manual(self):
+        return self._cmd_manual(False)
+
+    def _cmd_set_threshold(self, value: float):
+        previous = self.engine.threshold
+        if self.engine.set_threshold(float(value)) != previous:
+            self.logger.info(f"Threshold ajustado: {self.engine.threshold:.4f}")
+        return self.engine.threshold
+
+    def _cmd_threshold_step(self, delta: int):
+        return self._cmd_set_threshold(self.engine.threshold + delta * THRESHOLD_STEP)
+
+    def _cmd_set_auto_record(self, enabled: bool):
+        self.engine.set_auto_record(bool(enabled))
+        self.logger.info(f"Auto Record {'ativado' if self.engine.auto_record else 'desativado'}")
+        return self.engine.auto_record
+
+    def _cmd_toggle_auto_record(self):
+        return self._cmd_set_auto_record(not self.engine.auto_record)
+
+    def _cmd_mark(self, label: str | None = None):
+        position = self.engine.mark(label)
+        self.logger.info(f"Marcador em {position:.1f}s" + (f": {label}" if label else ""))
+        return position
+
+    def _cmd_save_defaults(self):
+        config.set("recorder.threshold", self.engine.threshold)
+        config.set("monitor.auto_record", self.engine.auto_record)
+        config.save()
 
-    def handle_block(self, block: np.ndarray):
-        # calc rms level before processing for logging and monitoring purposes
-        level = rms_level(block)
-        self._last_rms = level
-        
-        # prioridade: manual record
-        if self.manual_record:
-            if self.recording:
-                self.recorded_blocks.append(block)
-            return
-
-        # auto record normal
-        if not self.auto_record and not self.recording:
-            return
-
-        if self.recording:
-            self.recorded_blocks.append(block)
-
-            if level < self.threshold:
-                self.silence_samples += len(block)
-                if self.silence_samples >= self.max_silence_samples:
-                    self.stop_and_save()
-            else:
-                self.silence_samples = 0
-
-        else:
-            self.prebuffer.append(block)
-            if len(self.prebuffer) > self.prebuffer_size:
-                self.prebuffer.pop(0)
+        self.logger.info("Configuração salva como padrão")
 
-            if level >= self.threshold:
-                self.trigger_samples += len(block)
-                if self.trigger_samples >= self.min_trigger_samples:
-                    self.start_recording()
-            else:
-                self.trigger_samples = 0
+    def _cmd_status(self):
+        engine = self.engine
+        level = engine.last_level
+        return {
+            "device": engine.name,
+            "recording": engine.recording,
+            "manual_record": engine.manual_record,
+            "forced_record": engine.forced_record,
+            "auto_record": engine.auto_record,
+            "armed": engine.armed,
+            "input_paused": self.input_paused,
+            "threshold": engine.threshold,
+            "level": None if level is None else float(level),
+            "commands": self.command_count,
+            "command_max_queue_ms": round(self.command_max_queue_ms, 2),
+        }
 
     # =========================
-    # Start/Stop recording
+    # Audio handling
     # =========================
 
-    def start_recording(self):
-        if get_session_uptime() < 3:
-            self.logger.debug("Ignorando gatilho pois a sessão é muito recente (< 3s)")
-            self.prebuffer.clear()
-            self.trigger_samples = 0
-            return
+    def handle_block(self, block):
+        if self.schedule and monotonic() >= self._next_schedule_check:
+            self._apply_schedule()
 
-        self.recording = True
-        self.recorded_blocks = list(self.prebuffer)
-        self.prebuffer.clear()
-        self.silence_samples = 0
-        self.trigger_samples = 0
-        self.logger.info("Gravação iniciada")
-        led_rec.start_blinking()
+        self.engine.handle_block(block)
 
-    def stop_and_save(self):
+    def can_batch(self) -> bool:
+        return self.engine.can_batch()
 
-        self.recording = False
-        led_rec.stop_blinking()
+    def handle_batch(self, blocks: list):
+        if self.schedule and monotonic() >= self._next_schedule_check:
+            self._apply_schedule()
 
-        if not self.recorded_blocks:
-            self.logger.warning("Nenhum dado gravado para salvar.")
-            return
+        self.engine.handle_batch(blocks)
 
-        if not self.should_save():
-            self.recorded_blocks.clear()
+    def shutdown(self):
+        # saved takes still in postprocess / fingerprint: let them finish and
+        # reach the catalog instead of dying with the daemon workers
+        if not self.engine.wait_idle(SHUTDOWN_TIMEOUT_SECONDS):
+            self.logger.warning(f"Pós-processamento não terminou em {SHUTDOWN_TIMEOUT_SECONDS:g}s; encerrando assim mesmo")
             return
-
-        audio = np.concatenate(self.recorded_blocks)
-        pcm = float_to_int16(audio)
-
-        filename = current_filename()
-        wav_write(filename, SAMPLE_RATE, pcm)
-
-        self.recorded_blocks.clear()
-        self.silence_samples = 0
-
-        duration = len(audio) / SAMPLE_RATE
-        self.logger.info(f"Gravado: {filename} ({duration:.1f}s)")
-
-        send_ntfy_notification(
-            f"Gravado: {filename} ({duration:.1f}s)",
-            tags=["studio_microphone"],
-        )
+        self.engine.close()
 
     # =========================
-    # Check disk space
+    # Schedule
     # =========================
 
-    def should_save(self) -> bool:
-        try:
-            total_size = 0
-            for filename in os.listdir(OUTPUT_DIR):
-                if filename.endswith(".wav"):
-                    total_size += os.path.getsize(os.path.join(OUTPUT_DIR, filename))
-            if total_size > 12 * 1024 * 1024 * 1024:  # 12 GB
-                self.logger.warning("Gravação descartada (espaço insuficiente)")
-                self.recording = False
-                self.recorded_blocks.clear()
-                return False
-            return True
-        except Exception as e:
-            self.logger.error(f"Erro ao verificar espaço: {e}")
-            #later: display on oled error
-            return False
+    def handle_paused(self):
+        if self.schedule:
+            self._apply_schedule()
+
+    def _apply_schedule(self):
+        self._next_schedule_check = monotonic() + SCHEDULE_CHECK_SECONDS
+        state = self.schedule.state()
+        engine = self.engine
+
+        if state == FORCED:
+            if not engine.forced_record:
+                self.logger.info("Janela de gravação agendada iniciada")
+            if self.input_paused:
+                self.resume_input()
+            # retried every check until the take actually starts
+            engine.set_forced(True)
+
+        elif engine.forced_record:
+            self.logger.info("Janela de gravação agendada encerrada")
+            engine.set_forced(False)
+
+        armed = state != DISARMED
+        if armed != engine.armed:
+            engine.arm(armed)
+            self.logger.info(f"Agenda: auto record {'armado' if armed else 'desarmado'}")
+
+        if SCHEDULE["disarmed_mode"] == "idle":
+            needs_input = armed or engine.manual_record or engine.recording
+            if needs_input and self.input_paused:
+                self.resume_input()
+            elif not needs_input and not self.input_paused:
+                self.pause_input()
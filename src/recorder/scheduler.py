@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+
+ARMED = "armed"
+DISARMED = "disarmed"
+FORCED = "forced"
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+def _parse_datetime(value: str) -> datetime:
+    """ISO datetime as naive local time (what datetime.now() returns); offsets are converted."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+class Schedule:
+    """
+    Calendar windows for the recorder:
+
+    - armed: weekly windows ({"days": [...], "start": "HH:MM", "end": "HH:MM"})
+      where auto record may trigger; end <= start wraps past midnight
+    - forced: booked sessions ({"start": ISO datetime, "end": ISO datetime})
+      where recording runs regardless of level
+
+    Outside every window the recorder is disarmed. Invalid windows raise
+    ValueError here, at startup, never from state().
+    """
+
+    def __init__(self, armed: list, forced: list):
+        self.armed = [
+            (
+                {DAYS.index(day.lower()[:3]) for day in window.get("days", DAYS)},
+                _parse_time(window["start"]),
+                _parse_time(window["end"]),
+            )
+            for window in armed
+        ]
+        self.forced = [
+            (_parse_datetime(window["start"]), _parse_datetime(window["end"]), window.get("label"))
+            for window in forced
+        ]
+
+        for start, end, label in self.forced:
+            if end <= start:
+                raise ValueError(f"Janela agendada termina antes de começar: {label or start.isoformat()}")
+
+    @classmethod
+    def from_config(cls, settings: dict):
+        return cls(settings.get("armed", []), settings.get("forced", []))
+
+    def forced_window(self, now: datetime):
+        for start, end, label in self.forced:
+            if start <= now < end:
+                return start, end, label
+        return None
+
+    def is_armed(self, now: datetime) -> bool:
+        current = now.time()
+        yesterday = (now - timedelta(days=1)).weekday()
+
+        for days, start, end in self.armed:
+            if start < end:
+                if now.weekday() in days and start <= current < end:
+                    return True
+            else:
+                # overnight: the part after midnight belongs to the previous day's window
+                if now.weekday() in days and current >= start:
+                    return True
+                if yesterday in days and current < end:
+                    return True
+
+        return False
+
+    def state(self, now: datetime | None = None) -> str:
+        now = now or datetime.now()
+        if self.forced_window(now):
+            return FORCED
+        if self.is_armed(now):
+            return ARMED
+        return DISARMED
@@ -0,0 +1,239 @@
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits) -> numpy dtype of one sample on disk (24-bit: 3 raw bytes)
+_DTYPES = {
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 24): np.dtype(np.uint8),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+}
+
+# bit depths PcmConverter can write
+BIT_DEPTHS = (16, 24, 32)
+
+# full-scale value per integer bit depth
+_FULL_SCALE = {16: 32767, 24: 8388607}
+
+# =========================
+# Reading
+# =========================
+
+def read_wav_info(path) -> dict:
+    """Walk the RIFF chunks; returns format fields and where the data chunk lives."""
+    info = {}
+
+    with open(path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"{path}: não é um arquivo WAV")
+
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                tag, channels, rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    tag = struct.unpack("<H", fmt[24:26])[0]
+                info.update(format_tag=tag, channels=channels, sample_rate=rate,
+                            block_align=block_align, bits=bits)
+
+            elif chunk_id == b"data":
+                info["data_offset"] = f.tell()
+                info["data_bytes"] = chunk_size
+                break
+
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+    if "format_tag" not in info or "data_offset" not in info:
+        raise ValueError(f"{path}: WAV sem chunk fmt/data")
+
+    info["frames"] = info["data_bytes"] // info["block_align"]
+    return info
+
+
+def memmap_frames(path, info: dict | None = None):
+    """(info, frames) where frames is a read-only np.memmap of shape (frames, channels)."""
+    info = info or read_wav_info(path)
+
+    dtype = _DTYPES.get((info["format_tag"], info["bits"]))
+    if dtype is None:
+        raise ValueError(f"{path}: formato WAV não suportado ({info['format_tag']}, {info['bits']} bits)")
+
+    shape = (info["frames"], info["channels"])
+    if info["bits"] == 24:
+        shape += (3,)
+
+    frames = np.memmap(path, dtype=dtype, mode="r", offset=info["data_offset"], shape=shape)
+    return info, frames
+
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """On-disk samples -> float32 in [-1, 1] (new array; input may be a memmap slice)."""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) * (1.0 / 32768)
+
+    if samples.dtype == np.uint8:
+        # packed 24-bit little endian (..., 3) -> sign-extended int32
+        wide = samples.astype(np.int32)
+        value = wide[..., 0] | (wide[..., 1] << 8) | (wide[..., 2] << 16)
+        value = (value << 8) >> 8
+        return value.astype(np.float32) * (1.0 / 8388608)
+
+    return np.asarray(samples, dtype=np.float32)
+
+# =========================
+# Conversion
+# =========================
+
+class PcmConverter:
+    """
+    float32 blocks -> on-disk sample bytes for 16-bit, 24-bit packed or 32-bit float.
+
+    Gain, clipping, optional TPDF dither and the integer cast all happen in
+    place in buffers allocated once per take, so saving never builds a
+    full-size temporary of the whole recording.
+    """
+
+    def __init__(self, bits: int, block_size: int, gain: float = 1.0, dither: bool = False):
+        if bits not in BIT_DEPTHS:
+            raise ValueError(f"Profundidade de bits não suportada: {bits}")
+
+        self.bits = bits
+        self.dither = dither and bits != 32
+        self._scale = gain * _FULL_SCALE.get(bits, 1.0)
+        self._limit = _FULL_SCALE.get(bits, 1.0)
+        self._rng = np.random.default_rng()
+        self._allocate(block_size)
+
+    def _allocate(self, size: int):
+        self._work = np.empty(size, dtype=np.float32)
+        self._noise = np.empty(size, dtype=np.float32) if self.dither else None
+        if self.bits == 16:
+            self._out = np.empty(size, dtype="<i2")
+        elif self.bits == 24:
+            self._out = np.empty(size, dtype="<i4")
+            self._packed = np.empty((size, 3), dtype=np.uint8)
+
+    def convert(self, blocks) -> np.ndarray:
+        """
+        One block, or a list of blocks converted together (fewer Python-level
+        calls). Returns a view into the reused output buffer, valid until the next call.
+        """
+        if isinstance(blocks, np.ndarray):
+            n = len(blocks)
+        else:
+            n = sum(len(block) for block in blocks)
+
+        if n > len(self._work):
+            self._allocate(n)
+
+        work = self._work[:n]
+        if isinstance(blocks, np.ndarray):
+            np.multiply(blocks, self._scale, out=work)
+        else:
+            np.concatenate(blocks, out=work)
+            work *= self._scale
+
+        if self.dither:
+            # TPDF: difference of two uniform [0, 1) LSB sources, then round
+            noise = self._noise[:n]
+            work += self._rng.random(out=noise, dtype=np.float32)
+            work -= self._rng.random(out=noise, dtype=np.float32)
+            np.rint(work, out=work)
+
+        np.clip(work, -self._limit, self._limit, out=work)
+
+        if self.bits == 32:
+            return work
+
+        out = self._out[:n]
+        np.copyto(out, work, casting="unsafe")
+
+        if self.bits == 16:
+            return out
+
+        packed = self._packed[:n]
+        packed[:] = out.view(np.uint8).reshape(n, 4)[:, :3]
+        return packed
+
+# =========================
+# Writing
+# =========================
+
+class WavWriter:
+    """
+    Streaming WAV writer: header first with placeholder sizes, data appended
+    block by block, sizes patched on close().
+    """
+
+    def __init__(self, path, sample_rate: int, bits: int = 16, channels: int = 1, float_format: bool = False):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.bits = bits
+        self.channels = channels
+        self.format_tag = WAVE_FORMAT_IEEE_FLOAT if float_format else WAVE_FORMAT_PCM
+        self.block_align = channels * bits // 8
+        self.data_bytes = 0
+
+        self._f = open(path, "wb")
+        self._write_header()
+
+    @classmethod
+    def like(cls, path, info: dict):
+        """Writer with the same format as an existing file (see read_wav_info)."""
+        return cls(path, info["sample_rate"], info["bits"], info["channels"],
+                   float_format=info["format_tag"] == WAVE_FORMAT_IEEE_FLOAT)
+
+    @property
+    def frames(self) -> int:
+        return self.data_bytes // self.block_align
+
+    def _write_header(self):
+        fmt = struct.pack(
+            "<HHIIHH", self.format_tag, self.channels, self.sample_rate,
+            self.sample_rate * self.block_align, self.block_align, self.bits,
+        )
+        if self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            # non-PCM: cbSize field + fact chunk (sample frames)
+            fmt += struct.pack("<H", 0)
+            fact = b"fact" + struct.pack("<II", 4, self.frames)
+        else:
+            fact = b""
+
+        riff_size = 4 + (8 + len(fmt)) + len(fact) + 8 + self.data_bytes + (self.data_bytes & 1)
+        self._f.write(struct.pack("<4sI4s", b"RIFF", riff_size, b"WAVE"))
+        self._f.write(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+        self._f.write(fact)
+        self._f.write(b"data" + struct.pack("<I", self.data_bytes))
+
+    def write(self, data) -> None:
+        """Append raw little-endian sample bytes (bytes, memoryview or contiguous ndarray)."""
+        view = memoryview(data).cast("B")
+        self._f.write(view)
+        self.data_bytes += len(view)
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        if self.data_bytes & 1:
+            self._f.write(b"\0")  # RIFF chunks are word aligned
+        self._f.seek(0)
+        self._write_header()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,168 @@
+import logging
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src import config, logs
+from src.monitor import BLOCK_SIZE, SAMPLE_RATE, configured_channel_index, downmix, open_input_stream
+
+# =========================
+# Configuração
+# =========================
+
+RING_BLOCKS = config.get("monitor")["ring_blocks"]
+POLL_INTERVAL = BLOCK_SIZE / SAMPLE_RATE / 4  # reader sleep while the ring is empty
+JOIN_TIMEOUT_SECONDS = 10
+
+# header: int64 counters, padded to one cache line so the data starts aligned
+_WRITE, _READ, _OVERRUNS = 0, 1, 2
+_HEADER_BYTES = 64
+
+# =========================
+# Ring
+# =========================
+
+class ShmRing:
+    """
+    Single-producer / single-consumer ring of mono float32 blocks in shared memory.
+
+    The write and read indices are ever-increasing counters; each side only
+    stores its own index, so no lock is needed. The producer (PortAudio callback)
+    drops the block and counts an overrun when the consumer is a full ring behind.
+    """
+
+    def __init__(self, name=None, slots=RING_BLOCKS, block_size=BLOCK_SIZE, create=False):
+        self.slots = slots
+        self.block_size = block_size
+
+        size = _HEADER_BYTES + slots * block_size * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self._owner = create
+
+        self._header = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self._data = np.ndarray((slots, block_size), dtype=np.float32, buffer=self.shm.buf, offset=_HEADER_BYTES)
+
+        if create:
+            self._header[:] = 0
+
+    # ---------- producer ----------
+
+    def write(self, indata: np.ndarray, channel_index) -> bool:
+        """Downmix straight into the next free slot (no allocation). False on overrun."""
+        w = int(self._header[_WRITE])
+
+        if w - int(self._header[_READ]) >= self.slots or len(indata) != self.block_size:
+            self._header[_OVERRUNS] += 1
+            return False
+
+        downmix(indata, channel_index, out=self._data[w % self.slots])
+        self._header[_WRITE] = w + 1  # publish only after the slot is filled
+        return True
+
+    # ---------- consumer ----------
+
+    def read_view(self):
+        """View of the oldest unread slot, or None. Valid until release()."""
+        r = int(self._header[_READ])
+        if r >= int(self._header[_WRITE]):
+            return None
+        return self._data[r % self.slots]
+
+    def release(self):
+        self._header[_READ] += 1
+
+    def get_nowait(self):
+        """Copy of the oldest unread block (released right away), or None."""
+        view = self.read_view()
+        if view is None:
+            return None
+        block = view.copy()
+        self.release()
+        return block
+
+    def get(self) -> np.ndarray:
+        """Blocking read for consumers that keep the block (one copy out of the ring)."""
+        while True:
+            block = self.get_nowait()
+            if block is not None:
+                return block
+            time.sleep(POLL_INTERVAL)
+
+    @property
+    def overruns(self) -> int:
+        return int(self._header[_OVERRUNS])
+
+    def close(self):
+        # drop numpy views before closing the mapping
+        self._header = None
+        self._data = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+# =========================
+# Processing process
+# =========================
+
+def processing_main(ring_name, slots, block_size, log_queue):
+    """Triggering, encoding and file I/O, reading blocks from the ring."""
+    logs.setup_child_logging(log_queue)
+    logger = logging.getLogger("processing")
+
+    from src.recorder.rec import Recorder
+
+    ring = ShmRing(ring_name, slots=slots, block_size=block_size)
+    try:
+        Recorder(logger).run_ring(ring)
+    finally:
+        ring.close()
+
+# =========================
+# Capture (this process)
+# =========================
+
+def run_ring_mode(device_index, logger):
+    """
+    Capture process keeps only the PortAudio callback; everything else runs in a
+    separate process, so heavy work there can't hold this interpreter's GIL.
+    """
+    ctx = mp.get_context("spawn")
+    log_queue = ctx.Queue(logs.LOG_QUEUE_SIZE)
+    log_listener = logs.start_process_log_listener(log_queue)
+
+    ring = ShmRing(slots=RING_BLOCKS, block_size=BLOCK_SIZE, create=True)
+    channel_index = configured_channel_index()
+
+    worker = ctx.Process(
+        target=processing_main,
+        args=(ring.name, ring.slots, ring.block_size, log_queue),
+        name="processing",
+    )
+    worker.start()
+
+    def callback(indata, frames, time_info, status):
+        if status:
+            logger.warning(f"Audio status: {status}")
+        ring.write(indata, channel_index)
+
+    logger.info(f"Captura via memória compartilhada ({RING_BLOCKS} blocos, pid processamento {worker.pid})")
+
+    try:
+        with open_input_stream(device_index, callback):
+            while worker.is_alive():
+                worker.join(1.0)
+
+    except KeyboardInterrupt:
+        worker.join(JOIN_TIMEOUT_SECONDS)
+        if worker.is_alive():
+            worker.terminate()
+
+    finally:
+        if ring.overruns:
+            logger.warning(f"Ring: {ring.overruns} blocos descartados (processamento atrasado)")
+        worker.join(JOIN_TIMEOUT_SECONDS)
+        ring.close()
+        log_listener.stop()
@@ -0,0 +1,210 @@
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+
+from src import config, logs
+from src.recorder.files_manager import notify_saved, RetentionWorker
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Configuração
+# =========================
+
+OUTPUT_DIR = config.get("recorder")["output_dir"]
+JOIN_TIMEOUT_SECONDS = 10
+
+# =========================
+# Capture process
+# =========================
+
+def device_control(device: dict, name: str, index: int) -> dict:
+    """
+    Control block of one capture process. Devices without their own port /
+    unix_socket get the global ones made distinct (port + index, socket path
+    + name), since every child would otherwise try to bind the same address.
+    """
+    base = config.get("control")
+    control = dict(device.get("control", {}))
+    if "port" not in control and base["port"]:
+        control["port"] = base["port"] + index
+    if "unix_socket" not in control and base["unix_socket"]:
+        root, ext = os.path.splitext(base["unix_socket"])
+        control["unix_socket"] = f"{root}_{name}{ext}"
+    return control
+
+
+def _check_control_addresses(targets: list) -> None:
+    """Two enabled control servers on the same address: refuse before spawning anything."""
+    base = config.get("control")
+    seen = {}
+    for _, device, name, _, override in targets:
+        control = {**base, **override["control"]}
+        if not control["enabled"]:
+            continue
+        addresses = []
+        if control["port"]:
+            addresses.append(f"{control['host']}:{control['port']}")
+        if control["unix_socket"]:
+            addresses.append(control["unix_socket"])
+        for address in addresses:
+            if address in seen:
+                raise ValueError(f"Controle de '{name}' e '{seen[address]}' no mesmo endereço: {address}")
+            seen[address] = name
+
+
+def device_override(device: dict, name: str, index: int) -> dict:
+    """Per-device config merged over config.json inside its capture process."""
+    override = {
+        "general": {
+            "interface_name": device.get("interface_name"),
+            "hardware": device.get("hardware", False),
+        },
+        "monitor": dict(device.get("monitor", {})),
+        "recorder": dict(device.get("recorder", {})),
+        "control": device_control(device, name, index),
+    }
+    override["recorder"]["output_dir"] = os.path.join(OUTPUT_DIR, device.get("output_subdir", name))
+    return override
+
+
+def capture_main(name, device_index, cpu, log_queue, events):
+    """Entry point of one capture process (spawned, so config is loaded fresh with the override)."""
+    logs.setup_child_logging(log_queue)
+    log = logging.getLogger(name)
+
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            log.info(f"Processo de captura fixado na CPU {cpu}")
+        except OSError as e:
+            log.warning(f"Não foi possível fixar CPU {cpu}: {e}")
+
+    from src.recorder.rec import Recorder
+
+    recorder = Recorder(log, events=events, name=name)
+    if recorder.profiler:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: recorder.profiler.request_dump())
+
+    recorder.run(device_index)
+
+# =========================
+# Supervisor
+# =========================
+
+def _event_loop(events):
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        try:
+            notify_saved(event)
+        except Exception as e:
+            logger.error(f"Erro ao processar evento {event}: {e}")
+
+
+def _forward_signal(processes: list):
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, signum)
+                except ProcessLookupError:
+                    pass
+    return forward
+
+
+def _terminate(processes: list):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(JOIN_TIMEOUT_SECONDS)
+
+
+def run_supervisor(devices: list, find_input_device):
+    """
+    One capture process per configured device, pinned to its own core.
+    This process keeps the shared pieces: log file, notifier/catalog and retention.
+    """
+    # resolve every device first: a missing one must fail before anything is running
+    targets = []
+    for i, device in enumerate(devices):
+        name = device.get("name") or f"device{i}"
+        override = device_override(device, name, i)
+        targets.append((i, device, name, find_input_device(device.get("interface_name")), override))
+    _check_control_addresses(targets)
+
+    ctx = mp.get_context("spawn")
+    log_queue = ctx.Queue(logs.LOG_QUEUE_SIZE)
+    events = ctx.Queue()
+
+    log_listener = logs.start_process_log_listener(log_queue)
+
+    event_thread = threading.Thread(target=_event_loop, args=(events,), name="events", daemon=True)
+    event_thread.start()
+
+    retention = RetentionWorker()
+    retention.start()
+
+    cpu_count = os.cpu_count() or 1
+    processes = []
+
+    # `kill -USR1 <supervisor pid>` (see main.py) must not kill the supervisor:
+    # the profile dump is the capture processes' job, so it is passed on to them
+    if hasattr(signal, "SIGUSR1"):
+        if config.get("profiler")["enabled"]:
+            signal.signal(signal.SIGUSR1, _forward_signal(processes))
+        else:
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+    try:
+        try:
+            for i, device, name, device_index, override in targets:
+                # leave core 0 to the supervisor, GPIO threads and the OS when possible
+                cpu = device.get("cpu", (i + 1) % cpu_count)
+
+                process = ctx.Process(
+                    target=capture_main,
+                    args=(name, device_index, cpu, log_queue, events),
+                    name=f"capture-{name}",
+                )
+
+                # spawn copies os.environ at start(); config.load() in the child picks it up
+                os.environ[config.OVERRIDE_ENV] = json.dumps(override)
+                try:
+                    process.start()
+                finally:
+                    del os.environ[config.OVERRIDE_ENV]
+
+                logger.info(f"Captura '{name}' iniciada (pid {process.pid}, dispositivo {device_index}, CPU {cpu})")
+                processes.append(process)
+
+        except BaseException:
+            # don't leave the rooms already started recording without a supervisor
+            _terminate(processes)
+            raise
+
+        for process in processes:
+            process.join()
+            if process.exitcode:
+                logger.error(f"{process.name} terminou com código {process.exitcode}")
+
+    except KeyboardInterrupt:
+        # SIGINT reaches the whole process group; children stop on their own
+        for process in processes:
+            process.join(JOIN_TIMEOUT_SECONDS)
+        _terminate(processes)
+
+    finally:
+        retention.close()
+        try:
+            events.put_nowait(None)
+        except queue.Full:
+            pass
+        event_thread.join(JOIN_TIMEOUT_SECONDS)
+        log_listener.stop()